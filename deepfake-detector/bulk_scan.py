@@ -0,0 +1,268 @@
+"""
+Offline Bulk Scanner
+Scans media archives directly with the detector models, without going
+through the HTTP API. Files are grouped by modality into batches, scored
+across a pool of worker processes, and written to a JSONL results file.
+A manifest of successfully scanned paths lets an interrupted scan resume
+where it stopped and retry files that failed.
+
+Usage:
+    python bulk_scan.py /archive/2023 /archive/2024 --output results.jsonl
+    python bulk_scan.py --file-list paths.txt --output results.jsonl --workers 8
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Iterator, List, Optional, Set, Tuple
+
+from services.verdict import classify
+
+logger = logging.getLogger("bulk_scan")
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+VIDEO_EXTENSIONS = {".mp4", ".webm", ".mov", ".avi", ".mkv", ".m4v"}
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".ogg", ".flac", ".aac"}
+
+# Detectors loaded once per worker process by _init_worker
+_detectors = {}
+
+
+def infer_modality(path: str) -> Optional[str]:
+    """Guess the detection type from a file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        return "image"
+    if extension in VIDEO_EXTENSIONS:
+        return "video"
+    if extension in AUDIO_EXTENSIONS:
+        return "audio"
+    return None
+
+
+def iter_paths(roots: List[str], file_list: Optional[str]) -> Iterator[str]:
+    """Yield candidate files from directories, single files and a path list"""
+    if file_list:
+        source = sys.stdin if file_list == "-" else open(file_list)
+        with source:
+            for line in source:
+                path = line.strip()
+                if path:
+                    yield path
+
+    for root in roots:
+        if os.path.isfile(root):
+            yield root
+            continue
+        for directory, subdirs, files in os.walk(root):
+            subdirs.sort()
+            for name in sorted(files):
+                yield os.path.join(directory, name)
+
+
+def iter_batches(paths: Iterator[str], done: Set[str], types: Set[str],
+                 batch_size: int, stats: dict) -> Iterator[Tuple[str, List[str]]]:
+    """Group not-yet-scanned paths into per-modality batches"""
+    pending = {modality: [] for modality in types}
+
+    for path in paths:
+        path = os.path.abspath(path)
+        if path in done:
+            stats["skipped"] += 1
+            continue
+        modality = infer_modality(path)
+        if modality not in types:
+            continue
+
+        pending[modality].append(path)
+        if len(pending[modality]) >= batch_size:
+            yield modality, pending[modality]
+            pending[modality] = []
+
+    for modality, batch in pending.items():
+        if batch:
+            yield modality, batch
+
+
+def _init_worker(log_level: int):
+    """Load every detector once per worker process"""
+    logging.basicConfig(level=log_level)
+
+    from models.image_detector import load_image_model
+    from models.video_detector import load_video_model
+    from models.audio_detector import load_audio_model
+
+    _detectors["image"] = load_image_model()
+    _detectors["video"] = load_video_model()
+    _detectors["audio"] = load_audio_model()
+
+
+def scan_batch(modality: str, paths: List[str]) -> List[dict]:
+    """Preprocess a batch of same-modality files and score them together"""
+    detector = _detectors[modality]
+    records = []
+
+    if not detector.is_loaded:
+        for path in paths:
+            confidence = detector.predict_sync(path)
+            records.append(_record(path, modality, confidence))
+        return records
+
+    inputs, ready = [], []
+    for path in paths:
+        try:
+            tensor = detector.preprocess(path)
+            if not len(tensor):
+                raise ValueError("Nothing could be decoded")
+            inputs.append(tensor)
+            ready.append(path)
+        except Exception as e:
+            records.append(_error_record(path, modality, e))
+
+    if not ready:
+        return records
+
+    try:
+        scores = detector.infer_batch(inputs)
+    except Exception as e:
+        # Score the already decoded inputs one at a time so one bad input
+        # cannot sink the batch and nothing is decoded twice
+        logger.warning(f"Batch inference failed ({e}), scoring {len(ready)} files individually")
+        scores = []
+        for tensor in inputs:
+            try:
+                scores.append(detector.infer(tensor))
+            except Exception as error:
+                scores.append(error)
+
+    for path, score in zip(ready, scores):
+        if isinstance(score, Exception):
+            records.append(_error_record(path, modality, score))
+        else:
+            records.append(_record(path, modality, score))
+    return records
+
+
+def _record(path: str, modality: str, confidence: float) -> dict:
+    return {
+        "path": path,
+        "type": modality,
+        "result": classify(confidence),
+        "confidence": round(float(confidence), 4),
+    }
+
+
+def _error_record(path: str, modality: str, error: Exception) -> dict:
+    return {"path": path, "type": modality, "error": str(error) or type(error).__name__}
+
+
+def load_manifest(manifest_path: str) -> Set[str]:
+    """Paths already scanned by an earlier run"""
+    if not os.path.exists(manifest_path):
+        return set()
+    with open(manifest_path) as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def write_results(records: List[dict], output, manifest, stats: dict):
+    """Append a batch's records to the output and its successes to the manifest"""
+    for record in records:
+        output.write(json.dumps(record) + "\n")
+        if "error" in record:
+            stats["errors"] += 1
+        else:
+            stats["scanned"] += 1
+
+    # Results are flushed before the manifest so a resumed run never skips
+    # a file whose result was lost. Failed files stay out of the manifest
+    # so a resumed run retries them.
+    output.flush()
+    for record in records:
+        if "error" not in record:
+            manifest.write(record["path"] + "\n")
+    manifest.flush()
+
+
+def run_scan(args) -> dict:
+    """Drive the scan and return final counters"""
+    types = set(args.types.split(","))
+    manifest_path = args.manifest or f"{args.output}.manifest"
+    done = load_manifest(manifest_path)
+    if done:
+        logger.info(f"Resuming: {len(done)} files already scanned according to {manifest_path}")
+
+    stats = {"scanned": 0, "errors": 0, "skipped": 0}
+    batches = iter_batches(iter_paths(args.paths, args.file_list), done, types, args.batch_size, stats)
+
+    start = time.monotonic()
+    last_report = start
+    max_in_flight = args.workers * 2
+
+    # Spawn keeps workers independent of any framework state in this process
+    context = mp.get_context("spawn")
+    with open(args.output, "a") as output, open(manifest_path, "a") as manifest, \
+            ProcessPoolExecutor(args.workers, mp_context=context, initializer=_init_worker,
+                                initargs=(logger.getEffectiveLevel(),)) as pool:
+        in_flight = set()
+        exhausted = False
+
+        while in_flight or not exhausted:
+            # Keep a bounded number of batches queued so huge archives stream through
+            while not exhausted and len(in_flight) < max_in_flight:
+                batch = next(batches, None)
+                if batch is None:
+                    exhausted = True
+                    break
+                in_flight.add(pool.submit(scan_batch, *batch))
+
+            if not in_flight:
+                break
+
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                write_results(future.result(), output, manifest, stats)
+
+            now = time.monotonic()
+            if now - last_report >= args.report_interval:
+                _report(stats, now - start)
+                last_report = now
+
+    stats["elapsed"] = time.monotonic() - start
+    _report(stats, stats["elapsed"])
+    return stats
+
+
+def _report(stats: dict, elapsed: float):
+    processed = stats["scanned"] + stats["errors"]
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"{processed} files in {elapsed:.0f}s ({rate:.1f} files/s), "
+        f"{stats['errors']} errors, {stats['skipped']} skipped from manifest"
+    )
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk deepfake scan of local media files")
+    parser.add_argument("paths", nargs="*", help="Files or directories to scan")
+    parser.add_argument("--file-list", help="File with one path per line ('-' for stdin)")
+    parser.add_argument("--output", required=True, help="JSONL file to append results to")
+    parser.add_argument("--manifest", help="Checkpoint of finished paths (default: OUTPUT.manifest)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--batch-size", type=int, default=16, help="Files per inference batch")
+    parser.add_argument("--types", default="image,video,audio", help="Comma-separated modalities to scan")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="Seconds between throughput reports")
+    args = parser.parse_args(argv)
+
+    if not args.paths and not args.file_list:
+        parser.error("give at least one path or --file-list")
+    return args
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_scan(parse_args())
@@ -0,0 +1,347 @@
+"""
+Load Test Harness
+Stands in for the Node backend and drives a local detector instance the
+way DeepfakeService.detectWithLocal does: multipart POST /detect with a
+`file` and a `detectionType`, streamed without a Content-Length, 2 minute
+timeout, response must carry a `result`. Requests arrive open-loop (Poisson) at a series of offered
+rates so the output traces throughput and latency up to saturation.
+
+Usage:
+    python load_test.py --url http://localhost:8001 --rates 1,2,4,8,16 --step-duration 30
+    python load_test.py --samples ./samples --mix image=0.7,video=0.2,audio=0.1 --csv curve.csv
+"""
+
+import os
+import csv
+import math
+import time
+import uuid
+import wave
+import random
+import argparse
+import logging
+import mimetypes
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import requests
+
+from bulk_scan import infer_modality
+
+logger = logging.getLogger("load_test")
+
+REQUEST_TIMEOUT = 120  # Seconds, matches detectWithLocal
+UPLOAD_CHUNK_SIZE = 64 << 10  # Read size of a Node fs.ReadStream
+CACHE_HIT_DETAIL = "Matched previously analysed media"
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    """One HTTP session per sender thread, like a keep-alive agent"""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def synthesize_payloads(directory: str, variants: int = 20) -> Dict[str, List[str]]:
+    """
+    Write synthetic files for quick runs, `variants` per modality
+
+    Each variant is drawn from its own random pattern so no two are
+    near-duplicates of each other; only repeats of the same variant can be
+    answered from the service's near-duplicate index.
+    """
+    import cv2
+
+    payloads: Dict[str, List[str]] = {"image": [], "video": [], "audio": []}
+    rng = np.random.default_rng()
+    for n in range(variants):
+        # A coarse random pattern scaled up smoothly compresses like real
+        # footage (pure noise would not) and has its own perceptual hash
+        coarse = rng.integers(0, 256, (9, 16, 3), dtype=np.uint8)
+        base = cv2.resize(coarse, (1280, 720), interpolation=cv2.INTER_CUBIC)
+
+        image_path = os.path.join(directory, f"synthetic-{n}.jpg")
+        cv2.imwrite(image_path, base)
+        payloads["image"].append(image_path)
+
+        video_path = os.path.join(directory, f"synthetic-{n}.mp4")
+        frame = cv2.resize(base, (640, 360))
+        writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (640, 360))
+        for i in range(30 * 10):
+            writer.write(np.roll(frame, 4 * i, axis=1))
+        writer.release()
+        payloads["video"].append(video_path)
+
+        audio_path = os.path.join(directory, f"synthetic-{n}.wav")
+        samples = (rng.uniform(-0.3, 0.3, 44100 * 15) * 32767).astype(np.int16)
+        with wave.open(audio_path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(44100)
+            f.writeframes(samples.tobytes())
+        payloads["audio"].append(audio_path)
+
+    return payloads
+
+
+def collect_payloads(samples_dir: str) -> Dict[str, List[str]]:
+    """Group sample files by modality"""
+    payloads: Dict[str, List[str]] = {"image": [], "video": [], "audio": []}
+    for directory, _, files in os.walk(samples_dir):
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            modality = infer_modality(path)
+            if modality:
+                payloads[modality].append(path)
+    return payloads
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse 'image=0.6,video=0.3,audio=0.1' into normalized weights"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight)
+    total = sum(weights.values())
+    return {name: weight / total for name, weight in weights.items() if weight > 0}
+
+
+def multipart_body(path: str, detection_type: str, boundary: str) -> Iterator[bytes]:
+    """
+    Yield a detectWithLocal form: the file part, then detectionType
+
+    form-data cannot size a ReadStream, so the backend sends the body with
+    chunked encoding and no Content-Length. Passing a generator to requests
+    does the same. The service then has no size hint and grows, and possibly
+    spills, the scratch file as the body arrives.
+    """
+    name = os.path.basename(path)
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    yield (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{name}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            yield chunk
+    yield (
+        f"\r\n--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="detectionType"\r\n\r\n'
+        f"{detection_type}\r\n--{boundary}--\r\n"
+    ).encode()
+
+
+def send_detect(url: str, path: str, detection_type: str, scheduled: float) -> dict:
+    """
+    Issue one detectWithLocal-style request
+
+    Latency is measured from the scheduled arrival time rather than the
+    actual send, so client-side queueing under overload is not hidden.
+    """
+    try:
+        boundary = f"----LoadTestBoundary{uuid.uuid4().hex}"
+        response = _session().post(
+            f"{url}/detect",
+            data=multipart_body(path, detection_type, boundary),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            timeout=REQUEST_TIMEOUT,
+        )
+        body = response.json() if response.status_code == 200 else {}
+        ok = bool(body.get("result"))
+        tier = body.get("analysis_tier")
+        # Near-duplicate index hits skip inference and would flatter the curve
+        cached = any(CACHE_HIT_DETAIL in detail for detail in body.get("details", []))
+        error = None if ok else f"HTTP {response.status_code}"
+    except requests.Timeout:
+        ok, tier, cached, error = False, None, False, "timeout"
+    except Exception as e:
+        ok, tier, cached, error = False, None, False, type(e).__name__
+
+    return {
+        "type": detection_type,
+        "latency": time.monotonic() - scheduled,
+        "ok": ok,
+        "error": error,
+        "tier": tier,
+        "cached": cached,
+        "finished": time.monotonic(),
+    }
+
+
+def run_step(url: str, rate: float, duration: float, payloads: Dict[str, List[str]],
+             mix: Dict[str, float], executor: ThreadPoolExecutor) -> dict:
+    """Offer Poisson arrivals at `rate` req/s for `duration` seconds"""
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    futures = []
+
+    start = time.monotonic()
+    next_arrival = start
+    while next_arrival - start < duration:
+        delay = next_arrival - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        kind = random.choices(kinds, weights)[0]
+        path = random.choice(payloads[kind])
+        futures.append(executor.submit(send_detect, url, path, kind, next_arrival))
+        next_arrival += random.expovariate(rate)
+
+    results = [future.result() for future in futures]
+    return summarize(rate, duration, start, results)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    return float(np.percentile(values, q))
+
+
+def summarize(rate: float, duration: float, start: float, results: List[dict]) -> dict:
+    """
+    Throughput, latency percentiles and error rate for one step
+
+    Responses served from the near-duplicate index skip inference, so they
+    are counted separately and left out of sent_rps, throughput and latency.
+    """
+    ok = [r for r in results if r["ok"]]
+    analysed = [r for r in ok if not r["cached"]]
+    cached = len(ok) - len(analysed)
+    latencies = [r["latency"] for r in analysed]
+    # A backlog still draining after the window stretches the measured span
+    span = max([duration] + [r["finished"] - start for r in results])
+
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    tiers: Dict[str, int] = {}
+    for r in ok:
+        tiers[r["tier"] or "unknown"] = tiers.get(r["tier"] or "unknown", 0) + 1
+
+    return {
+        "offered_rps": rate,
+        "sent": len(results),
+        "sent_rps": (len(results) - cached) / duration,
+        "throughput_rps": len(analysed) / span,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "cached": cached,
+        "errors": errors,
+        "tiers": tiers,
+    }
+
+
+def find_knee(steps: List[dict]) -> Optional[dict]:
+    """
+    First step past saturation: throughput falls below 90% of the arrivals
+    actually sent (both excluding near-duplicate hits), p95 more than
+    doubles from the lightest step, or errors exceed 1%
+    """
+    if not steps:
+        return None
+    baseline_p95 = steps[0]["p95_ms"]
+    for step in steps:
+        if (step["throughput_rps"] < 0.9 * step["sent_rps"]
+                or (not math.isnan(baseline_p95) and step["p95_ms"] > 2 * baseline_p95)
+                or step["error_rate"] > 0.01):
+            return step
+    return None
+
+
+def plot_curve(steps: List[dict], path: str):
+    """Save a throughput/latency saturation chart (needs matplotlib)"""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        logger.warning("matplotlib not installed, skipping plot")
+        return
+
+    offered = [s["offered_rps"] for s in steps]
+    fig, (top, bottom) = plt.subplots(2, 1, figsize=(8, 8), sharex=True)
+    top.plot(offered, [s["throughput_rps"] for s in steps], marker="o", label="achieved")
+    top.plot(offered, offered, linestyle="--", color="grey", label="offered")
+    top.set_ylabel("throughput (req/s)")
+    top.legend()
+    for q in ("p50_ms", "p95_ms", "p99_ms"):
+        bottom.plot(offered, [s[q] for s in steps], marker="o", label=q.split("_")[0])
+    bottom.set_xlabel("offered load (req/s)")
+    bottom.set_ylabel("latency (ms)")
+    bottom.set_yscale("log")
+    bottom.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+    logger.info(f"Saved saturation curve to {path}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Load test the detector like the Node backend does")
+    parser.add_argument("--url", default=os.getenv("LOCAL_DETECT_URL", "http://localhost:8001"))
+    parser.add_argument("--samples", help="Directory of sample media (synthetic files if omitted)")
+    parser.add_argument("--variants", type=int, default=20, help="Distinct synthetic files per modality")
+    parser.add_argument("--mix", default="image=0.6,video=0.3,audio=0.1", help="Request mix by detection type")
+    parser.add_argument("--rates", default="0.5,1,2,4,8", help="Comma-separated offered rates (req/s)")
+    parser.add_argument("--step-duration", type=float, default=30.0, help="Seconds per rate step")
+    parser.add_argument("--max-concurrency", type=int, default=256, help="Sender threads")
+    parser.add_argument("--csv", help="Write per-step results to this CSV file")
+    parser.add_argument("--plot", help="Write a saturation chart to this PNG file")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.samples:
+            payloads = collect_payloads(args.samples)
+        else:
+            payloads = synthesize_payloads(tmp_dir, args.variants)
+        missing = [kind for kind in mix if not payloads.get(kind)]
+        if missing:
+            parser.error(f"no sample files for: {', '.join(missing)}")
+
+        steps = []
+        with ThreadPoolExecutor(args.max_concurrency) as executor:
+            for rate in (float(r) for r in args.rates.split(",")):
+                logger.info(f"Offering {rate:g} req/s for {args.step_duration:g}s")
+                step = run_step(args.url, rate, args.step_duration, payloads, mix, executor)
+                steps.append(step)
+                logger.info(
+                    f"  {step['throughput_rps']:.2f} req/s achieved, p50 {step['p50_ms']:.0f} ms, "
+                    f"p95 {step['p95_ms']:.0f} ms, p99 {step['p99_ms']:.0f} ms, "
+                    f"errors {step['error_rate']:.1%} {step['errors'] or ''}, tiers {step['tiers']}"
+                )
+                if step["cached"]:
+                    logger.warning(
+                        f"  {step['cached']} responses came from the near-duplicate index and are "
+                        f"excluded above; use more distinct samples or PHASH_ENABLED=false"
+                    )
+
+    if args.csv:
+        fields = ["offered_rps", "sent", "throughput_rps", "p50_ms", "p95_ms", "p99_ms",
+                  "error_rate", "cached"]
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(steps)
+    if args.plot:
+        plot_curve(steps, args.plot)
+
+    knee = find_knee(steps)
+    if knee:
+        logger.info(f"Saturation knee at about {knee['offered_rps']:g} req/s offered")
+    else:
+        logger.info("No saturation observed; try higher --rates")
+    return steps
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,13 +1,18 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import uvicorn
-import tempfile
-import shutil
 import os
-from typing import List
+import errno
+import hmac
+import asyncio
+from typing import List, Dict, Optional
 import logging
 
+from services.adaptive_quality import configure_detector
+from services.verdict import DEEPFAKE_THRESHOLD, classify
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,12 +33,72 @@ class DetectResponse(BaseModel):
     result: str  # "authentic", "deepfake", "suspicious"
     confidence: float  # 0.0 to 1.0
     details: List[str]
+    modality_scores: Optional[Dict[str, Optional[float]]] = None  # Per-modality confidence for combined analysis
+    analysis_tier: str = "full"  # "full", "reduced" or "minimal" depending on load
+
+# Form fields of POST /detect (the body is parsed as it streams in, not by FastAPI)
+DETECT_FORM_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file", "detectionType"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        "detectionType": {
+                            "type": "string",
+                            "enum": ["image", "video", "audio", "audiovisual"],
+                        },
+                    },
+                }
+            }
+        },
+    }
+}
+
+# Model registry admin request
+class ModelVersionRequest(BaseModel):
+    version: str  # Directory name under MODEL_REGISTRY_DIR/<kind>/, or "default"
+    sample_rate: float = 0.1  # Fraction of traffic a shadow candidate scores
 
 # Global model variables (will be loaded at startup)
 image_model = None
 video_model = None
 audio_model = None
 
+# Set once every loaded detector has processed a synthetic input
+models_warmed_up = False
+
+# Near-duplicate index of earlier verdicts (loaded at startup)
+phash_index = None
+
+# Per-request stage timing and slow-request capture (loaded at startup)
+profiler = None
+
+# Out-of-process inference over shared memory (None = run in-process)
+inference_pool = None
+
+# Memory-backed staging for uploads (loaded at startup)
+scratch = None
+
+# Chooses the analysis tier from current load (loaded at startup)
+quality = None
+
+# Versioned models, hot swaps and shadow scoring (loaded at startup)
+registry = None
+
+# Threads for scans of videos still being uploaded (loaded at startup)
+progressive_scans = None
+
+# Cached near-duplicate verdicts that depend on each model kind
+PHASH_TYPES_BY_MODEL = {
+    "image": ["image"],
+    "video": ["video"],
+    "audio": [],
+}
+
 def load_models():
     """Load deepfake detection models"""
     global image_model, video_model, audio_model
@@ -45,13 +110,13 @@ def load_models():
         from models.audio_detector import load_audio_model
         
         logger.info("Loading image detection model...")
-        image_model = load_image_model()
+        image_model = load_image_model(registry.active_path("image") if registry else None)
         
         logger.info("Loading video detection model...")
-        video_model = load_video_model()
+        video_model = load_video_model(registry.active_path("video") if registry else None)
         
         logger.info("Loading audio detection model...")
-        audio_model = load_audio_model()
+        audio_model = load_audio_model(registry.active_path("audio") if registry else None)
         
         logger.info("All models loaded successfully!")
         
@@ -59,10 +124,109 @@ def load_models():
         logger.error(f"Error loading models: {e}")
         logger.warning("Running with mock models for testing")
 
+def warm_up_models():
+    """Push synthetic inputs through every detector so first-call setup
+    (graph compilation, cv2/librosa initialisation) happens before traffic"""
+    global models_warmed_up
+    
+    if os.getenv("WARMUP_ENABLED", "true").lower() in ("0", "false", "no"):
+        logger.info("Model warm-up disabled")
+        return
+    
+    import time
+    
+    all_warmed_up = True
+    for name, model in (("image", image_model), ("video", video_model), ("audio", audio_model)):
+        if model is None:
+            continue
+        start = time.perf_counter()
+        if model.warm_up():
+            logger.info(f"Warmed up {name} model in {time.perf_counter() - start:.2f}s")
+        else:
+            logger.warning(f"Warm-up of {name} model failed; first requests may be slow or fail")
+            all_warmed_up = False
+    
+    # Only report ready when every detector went through its warm-up
+    models_warmed_up = all_warmed_up
+
+def swap_model(kind: str, detector):
+    """Publish a newly loaded model version; in-flight requests keep the old one"""
+    global image_model, video_model, audio_model
+    
+    if kind == "image":
+        image_model = detector
+    elif kind == "video":
+        video_model = detector
+    elif kind == "audio":
+        audio_model = detector
+    
+    # Verdicts cached from the replaced model no longer apply
+    if phash_index is not None:
+        phash_index.discard(PHASH_TYPES_BY_MODEL[kind])
+
+def serving_models() -> Dict[str, object]:
+    """The detector currently published for each model kind"""
+    return {"image": image_model, "video": video_model, "audio": audio_model}
+
+def prepare_workers(kind: str, model_path: Optional[str]):
+    """Have inference workers load and warm up a version before it is swapped in"""
+    if inference_pool is not None:
+        inference_pool.load_model(kind, model_path)
+
 @app.on_event("startup")
 async def startup_event():
-    """Load models when the service starts"""
+    """Load and warm up models when the service starts"""
+    global phash_index, profiler, inference_pool, scratch, quality, registry, progressive_scans
+    global models_warmed_up
+    
+    from services.model_registry import KINDS, load_model_registry
+    registry = load_model_registry(swap_model, prepare_workers)
     load_models()
+    
+    from services.adaptive_quality import load_quality_controller
+    quality = load_quality_controller()
+    
+    from services.scratch import load_scratch_storage
+    scratch = load_scratch_storage()
+    
+    from services.progressive import load_scan_executor
+    progressive_scans = load_scan_executor()
+    
+    # Uvicorn only starts accepting connections once startup completes,
+    # so the service is not reachable until warm-up has finished
+    await asyncio.to_thread(warm_up_models)
+
+    from services.phash_index import load_phash_index
+    phash_index = load_phash_index()
+
+    from services.profiling import load_profiler
+    profiler = load_profiler()
+
+    from services.shm_transport import load_inference_pool
+    # Workers start on the active versions rather than the loader defaults
+    active_paths = {kind: registry.active_path(kind) for kind in KINDS}
+    inference_pool = await asyncio.to_thread(load_inference_pool, active_paths)
+    # start() returns once every worker has warmed up its own copy of the models
+    if inference_pool is not None and not inference_pool.warmed_up:
+        models_warmed_up = False
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Persist state that should survive a restart"""
+    if phash_index is not None:
+        try:
+            phash_index.save()
+        except Exception as e:
+            logger.error(f"Failed to save perceptual hash index: {e}")
+    
+    if inference_pool is not None:
+        inference_pool.close()
+    
+    if registry is not None:
+        registry.close()
+    
+    if progressive_scans is not None:
+        progressive_scans.shutdown()
 
 @app.get("/")
 async def root():
@@ -74,52 +238,116 @@ async def root():
             "image": image_model is not None,
             "video": video_model is not None,
             "audio": audio_model is not None
-        }
+        },
+        "model_versions": dict(registry.active) if registry is not None else None,
+        "models_warmed_up": models_warmed_up,
+        "analysis_quality": quality.snapshot() if quality is not None else None,
+        "phash_index_entries": len(phash_index) if phash_index is not None else 0
     }
 
-@app.post("/detect", response_model=DetectResponse)
-async def detect_deepfake(
-    file: UploadFile = File(...),
-    detectionType: str = Form(...)
-):
+@app.post("/detect", response_model=DetectResponse, openapi_extra=DETECT_FORM_SCHEMA)
+async def detect_deepfake(request: Request, response: Response):
     """
     Detect deepfakes in uploaded media files
     
+    The multipart body is written to scratch storage as it arrives, so large
+    uploads never pass through Starlette's on-disk spool.
+    
+    Send an X-Profile header ("1" for stage timings, "full" to also capture
+    a cProfile of the event loop, which includes concurrent requests) to
+    get a Server-Timing breakdown of the request.
+    
     Args:
         file: Media file (image, video, or audio)
-        detectionType: Type of detection ("image", "video", or "audio")
+        detectionType: Type of detection ("image", "video", "audio", or
+            "audiovisual" to score a video's frames and soundtrack together)
     
     Returns:
         Detection result with confidence and details
     """
+    from services.profiling import PROFILE_HEADER, load_profiler
+    from services.adaptive_quality import load_quality_controller
+    from services.scratch import load_scratch_storage
+    from services.uploads import UploadError, receive_upload
     
-    # Validate detection type
-    valid_types = ["image", "video", "audio"]
-    if detectionType not in valid_types:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid detection type. Must be one of: {valid_types}"
-        )
+    # Transfer time depends on the client's network, so only the scratch writes
+    # (including any spill to disk) are timed, as the upload_write stage
+    try:
+        upload = await receive_upload(request, scratch or load_scratch_storage())
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError as e:
+        if e.errno != errno.ENOSPC:
+            raise
+        raise HTTPException(status_code=507, detail="Not enough scratch space to stage the upload")
+    detectionType = upload.fields.get("detectionType", "")
+    
+    profile_header = request.headers.get(PROFILE_HEADER)
+    with (quality or load_quality_controller()).track() as tier:
+        async with (profiler or load_profiler()).profile_request(
+            f"{detectionType} {upload.filename}", profile_header,
+            stages=[("upload_write", upload.write_seconds)],
+        ) as profile:
+            result = await process_upload(upload, detectionType, tier)
+    
+    if profile_header:
+        response.headers["Server-Timing"] = profile.server_timing()
+        response.headers["X-Profile-Id"] = profile.id
     
-    # Validate file type
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No filename provided")
+    return result
+
+async def process_upload(upload, detectionType: str, tier: str = "full") -> DetectResponse:
+    """Validate a staged upload and run detection on it at an analysis tier"""
+    from services.profiling import stage
+    from services.phash_index import INDEXED_TYPES, compute_hashes
     
-    # Create temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = tmp.name
+    # Decoders open the staged file by path (in memory when it fits the quota)
+    staged = upload.file
+    handed_to_shadow = False
     
     try:
-        logger.info(f"Processing {detectionType} file: {file.filename}")
+        # Validate detection type
+        valid_types = ["image", "video", "audio", "audiovisual"]
+        if detectionType not in valid_types:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid detection type. Must be one of: {valid_types}"
+            )
+        
+        # Validate file type
+        if not upload.filename:
+            raise HTTPException(status_code=400, detail="No filename provided")
+        
+        tmp_path = staged.path
+        
+        logger.info(f"Processing {detectionType} file: {upload.filename}")
+        
+        # Reuse the verdict of an earlier near-duplicate if we have one
+        hashes = []
+        if phash_index is not None and detectionType in INDEXED_TYPES:
+            with stage("phash"):
+                hashes = await asyncio.to_thread(compute_hashes, detectionType, tmp_path)
+                match = phash_index.lookup(detectionType, hashes)
+            if match:
+                result, distance = match
+                result["details"] = list(result["details"]) + [
+                    f"Matched previously analysed media (hash distance {distance})"
+                ]
+                logger.info(f"Near-duplicate match for {upload.filename} at distance {distance}")
+                return DetectResponse(**result)
+        
+        # Detectors are picked up from the globals without awaiting in between
+        models_used = serving_models()
         
         # Run detection based on type
         if detectionType == "image":
-            result = await detect_image(tmp_path)
+            result = await detect_image(tmp_path, tier)
         elif detectionType == "video":
-            result = await detect_video(tmp_path)
+            result = await detect_video(tmp_path, tier)
         elif detectionType == "audio":
-            result = await detect_audio(tmp_path)
+            result = await detect_audio(tmp_path, tier)
+        elif detectionType == "audiovisual":
+            result = await detect_audiovisual(tmp_path, tier)
         else:
             result = {
                 "result": "suspicious",
@@ -127,168 +355,448 @@ async def detect_deepfake(
                 "details": ["Unknown detection type"]
             }
         
+        result["analysis_tier"] = tier
         logger.info(f"Detection result: {result}")
+        
+        # A swap during detection already discarded the old model's entries;
+        # this verdict came from the old model too, so it must not be added back
+        swapped = [
+            kind for kind, model in serving_models().items()
+            if model is not models_used[kind] and detectionType in PHASH_TYPES_BY_MODEL[kind]
+        ]
+        if hashes and not result.get("error") and not swapped:
+            phash_index.add(detectionType, hashes, result)
+        
+        # A shadow candidate rescores sampled uploads off the response path
+        if registry is not None and not result.get("error"):
+            handed_to_shadow = registry.shadow(detectionType, staged, result["confidence"], tier)
+        
         return DetectResponse(**result)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Detection error: {e}")
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
     
     finally:
-        # Clean up temporary file
-        try:
-            os.unlink(tmp_path)
-        except Exception as e:
-            logger.warning(f"Failed to delete temp file: {e}")
+        # Clean up scratch file (the shadow scorer discards it once done)
+        if not handed_to_shadow:
+            staged.discard()
+
+@app.post("/detect/stream/{session_id}", response_model=DetectResponse)
+async def detect_video_stream(session_id: str, request: Request, filename: str = "upload.mp4"):
+    """
+    Analyse a video while it is still being uploaded
+    
+    The request body is the raw video (not multipart), ideally a streamable
+    container such as fragmented MP4. Frames are scored as bytes arrive and
+    interim confidence is published to GET /detect/stream/{session_id}/events,
+    which the client can open before or during the upload.
+    
+    Args:
+        session_id: Client-chosen identifier shared with the events stream
+        filename: Original filename, used for the container extension
+    
+    Returns:
+        Final detection result, also sent as the "result" event
+    """
+    from services.adaptive_quality import load_quality_controller
+    
+    # The upload counts as in flight, but its duration is mostly the client's
+    # network; only the work left once the body is complete counts as latency
+    controller = quality or load_quality_controller()
+    with controller.track(measure_latency=False) as tier:
+        return await process_video_stream(session_id, request, filename, tier, controller)
+
+async def process_video_stream(session_id: str, request: Request, filename: str, tier: str,
+                               controller) -> DetectResponse:
+    """Stage a streamed upload while scoring it, publishing progress to its session"""
+    from services.progressive import (
+        GrowingFile, SessionBusyError, load_scan_executor, scan_growing_video, sessions
+    )
+    from services.scratch import load_scratch_storage
+    
+    # A scan holds a thread until the upload ends, so refuse rather than queue.
+    # Nothing awaits between this check and submit(), so the slot stays free.
+    scans = progressive_scans or load_scan_executor()
+    video_detector = configure_detector(video_model, "video", tier)
+    scanning = video_detector is not None and video_detector.is_loaded
+    if scanning and scans.saturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many progressive uploads in progress, retry shortly",
+            headers={"Retry-After": "5"},
+        )
+    
+    try:
+        session = sessions.start_upload(session_id)
+    except SessionBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    loop = asyncio.get_running_loop()
+    
+    def on_update(update: dict):
+        loop.call_soon_threadsafe(session.publish, "partial", update)
+    
+    suffix = os.path.splitext(filename)[1] or ".mp4"
+    content_length = request.headers.get("content-length")
+    try:
+        staged = (scratch or load_scratch_storage()).create(
+            suffix, size_hint=int(content_length) if content_length else None
+        )
+    except Exception as e:
+        # Release the session so the client can retry under the same id
+        session.publish("error", {"detail": str(e)})
+        raise
+    growing = GrowingFile(staged.path)
+    
+    scan_task = None
+    if scanning:
+        scan_task = scans.submit(scan_growing_video, video_detector, growing, on_update)
+    
+    try:
+        logger.info(f"Streaming video upload {session_id}: {filename}")
+        session.publish("started", {"session_id": session_id})
+        
+        received = 0
+        async for chunk in request.stream():
+            if not chunk:
+                continue
+            await staged.write_async(chunk)
+            await staged.flush_async()
+            received += len(chunk)
+            
+            # The path changes if the file spills from memory to disk
+            growing.path = staged.path
+            growing.grew(received)
+        
+        growing.finish()
+        
+        with controller.measure():
+            confidence = None
+            if scan_task is not None:
+                try:
+                    confidence = await scan_task
+                except Exception as e:
+                    logger.warning(f"Progressive scan of {session_id} failed: {e}")
+            if confidence is None:
+                # Container was not decodable progressively; score the whole file
+                result = await detect_video(staged.path, tier)
+            else:
+                result = verdict("video", confidence)
+        
+        result["details"] = list(result["details"]) + [f"Analysed progressively from {received} uploaded bytes"]
+        result["analysis_tier"] = tier
+        session.publish("result", result)
+        return DetectResponse(**result)
+        
+    except Exception as e:
+        logger.error(f"Streaming detection error: {e}")
+        session.publish("error", {"detail": str(e)})
+        raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
+    
+    finally:
+        growing.finish()
+        if scan_task is not None and not scan_task.done():
+            await asyncio.gather(scan_task, return_exceptions=True)
+        staged.discard()
+
+@app.get("/detect/stream/{session_id}/events")
+async def detect_video_stream_events(session_id: str):
+    """Server-Sent Events feed of interim and final verdicts for a streamed upload"""
+    from services.progressive import sessions
+    
+    session = sessions.get_or_create(session_id)
+    return StreamingResponse(
+        session.subscribe(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def require_model_admin(request: Request, write: bool = False):
+    """
+    Check the admin token when MODEL_ADMIN_TOKEN is configured
+    
+    Without a token, GET /models stays readable but endpoints that change
+    models (write=True) are disabled.
+    """
+    token = os.getenv("MODEL_ADMIN_TOKEN")
+    if not token and write:
+        raise HTTPException(status_code=403, detail="Model administration is disabled; set MODEL_ADMIN_TOKEN")
+    if token and not hmac.compare_digest(request.headers.get("X-Admin-Token", "").encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if registry is None:
+        raise HTTPException(status_code=503, detail="Model registry not loaded")
+
+@app.get("/models")
+async def list_models(request: Request):
+    """Active, available and shadow model versions per kind"""
+    require_model_admin(request)
+    return registry.status()
+
+@app.post("/models/{kind}/activate", status_code=202)
+async def activate_model(kind: str, body: ModelVersionRequest, request: Request):
+    """
+    Load a model version in the background and swap it in once warmed up
+    
+    Requests keep being served by the current version until the swap. Poll
+    GET /models to see when it is active or why it failed to load.
+    """
+    require_model_admin(request, write=True)
+    try:
+        registry.activate(kind, body.version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"kind": kind, "version": body.version, "status": "loading"}
 
-async def detect_image(file_path: str) -> dict:
+@app.post("/models/{kind}/shadow", status_code=202)
+async def start_shadow_model(kind: str, body: ModelVersionRequest, request: Request):
+    """Load a candidate version and score a sample of traffic with it in the background"""
+    require_model_admin(request, write=True)
+    if not 0.0 < body.sample_rate <= 1.0:
+        raise HTTPException(status_code=400, detail="sample_rate must be in (0, 1]")
+    try:
+        registry.start_shadow(kind, body.version, body.sample_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"kind": kind, "version": body.version, "status": "loading"}
+
+@app.delete("/models/{kind}/shadow")
+async def stop_shadow_model(kind: str, request: Request):
+    """Stop shadow scoring and return the final comparison"""
+    require_model_admin(request, write=True)
+    summary = registry.stop_shadow(kind)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"No shadow {kind} model running")
+    return summary
+
+# Explanations returned with each verdict, by detection type
+VERDICT_DETAILS = {
+    "image": {
+        "deepfake": [
+            "High confidence deepfake detection",
+            "Facial manipulation artifacts detected",
+            "Inconsistent lighting patterns found",
+            "Pixel-level manipulation signatures identified"
+        ],
+        "suspicious": [
+            "Medium confidence detection",
+            "Some suspicious patterns detected",
+            "Requires manual verification",
+            "Minor artifacts found"
+        ],
+        "authentic": [
+            "No manipulation detected",
+            "Natural facial features",
+            "Consistent lighting patterns",
+            "Authentic content signatures"
+        ],
+    },
+    "video": {
+        "deepfake": [
+            "High confidence video deepfake detection",
+            "Temporal inconsistencies detected",
+            "Unnatural facial movements found",
+            "Frame manipulation artifacts identified"
+        ],
+        "suspicious": [
+            "Medium confidence video detection",
+            "Some temporal artifacts detected",
+            "Requires extended analysis",
+            "Minor motion inconsistencies found"
+        ],
+        "authentic": [
+            "No video manipulation detected",
+            "Natural temporal flow",
+            "Consistent motion patterns",
+            "Authentic video signatures"
+        ],
+    },
+    "audio": {
+        "deepfake": [
+            "High confidence audio deepfake detection",
+            "Synthetic voice patterns detected",
+            "Voice cloning signatures found",
+            "Unnatural speech characteristics identified"
+        ],
+        "suspicious": [
+            "Medium confidence audio detection",
+            "Some suspicious patterns detected",
+            "Requires audio expert review",
+            "Minor processing artifacts found"
+        ],
+        "authentic": [
+            "No audio manipulation detected",
+            "Natural speech patterns",
+            "Consistent audio quality",
+            "Authentic recording characteristics"
+        ],
+    },
+    "audiovisual": {
+        "deepfake": ["High confidence audio-visual deepfake detection"],
+        "suspicious": [
+            "Medium confidence audio-visual detection",
+            "Requires manual verification"
+        ],
+        "authentic": ["No audio-visual manipulation detected"],
+    },
+}
+
+def verdict(detection_type: str, confidence: float) -> dict:
+    """Turn a deepfake probability into a detection result"""
+    result = classify(confidence)
+    return {
+        "result": result,
+        "confidence": float(confidence),
+        "details": list(VERDICT_DETAILS[detection_type][result])
+    }
+
+async def detect_image(file_path: str, tier: str = "full") -> dict:
     """Detect deepfakes in images"""
+    image_detector = configure_detector(image_model, "image", tier)
     try:
-        if image_model:
+        if image_detector:
             # Use actual model
-            confidence = await image_model.predict(file_path)
+            if inference_pool is not None:
+                confidence = await inference_pool.predict("image", image_detector, file_path)
+            else:
+                confidence = await image_detector.predict(file_path)
         else:
             # Mock detection for testing
             confidence = 0.15  # Mock result
         
-        # Determine classification
-        if confidence > 0.7:
-            result = "deepfake"
-            details = [
-                "High confidence deepfake detection",
-                "Facial manipulation artifacts detected",
-                "Inconsistent lighting patterns found",
-                "Pixel-level manipulation signatures identified"
-            ]
-        elif confidence > 0.3:
-            result = "suspicious"
-            details = [
-                "Medium confidence detection",
-                "Some suspicious patterns detected",
-                "Requires manual verification",
-                "Minor artifacts found"
-            ]
-        else:
-            result = "authentic"
-            details = [
-                "No manipulation detected",
-                "Natural facial features",
-                "Consistent lighting patterns",
-                "Authentic content signatures"
-            ]
-        
-        return {
-            "result": result,
-            "confidence": float(confidence),
-            "details": details
-        }
+        return verdict("image", confidence)
         
     except Exception as e:
         logger.error(f"Image detection error: {e}")
         return {
             "result": "suspicious",
             "confidence": 0.5,
-            "details": [f"Detection error: {str(e)}"]
+            "details": [f"Detection error: {str(e)}"],
+            "error": True
         }
 
-async def detect_video(file_path: str) -> dict:
+async def detect_video(file_path: str, tier: str = "full") -> dict:
     """Detect deepfakes in videos"""
+    video_detector = configure_detector(video_model, "video", tier)
     try:
-        if video_model:
+        if video_detector:
             # Use actual model
-            confidence = await video_model.predict(file_path)
+            if inference_pool is not None:
+                confidence = await inference_pool.predict("video", video_detector, file_path)
+            else:
+                confidence = await video_detector.predict(file_path)
         else:
             # Mock detection for testing
             confidence = 0.65  # Mock result
         
-        # Determine classification
-        if confidence > 0.7:
-            result = "deepfake"
-            details = [
-                "High confidence video deepfake detection",
-                "Temporal inconsistencies detected",
-                "Unnatural facial movements found",
-                "Frame manipulation artifacts identified"
-            ]
-        elif confidence > 0.3:
-            result = "suspicious"
-            details = [
-                "Medium confidence video detection",
-                "Some temporal artifacts detected",
-                "Requires extended analysis",
-                "Minor motion inconsistencies found"
-            ]
-        else:
-            result = "authentic"
-            details = [
-                "No video manipulation detected",
-                "Natural temporal flow",
-                "Consistent motion patterns",
-                "Authentic video signatures"
-            ]
-        
-        return {
-            "result": result,
-            "confidence": float(confidence),
-            "details": details
-        }
+        return verdict("video", confidence)
         
     except Exception as e:
         logger.error(f"Video detection error: {e}")
         return {
             "result": "suspicious",
             "confidence": 0.5,
-            "details": [f"Video detection error: {str(e)}"]
+            "details": [f"Video detection error: {str(e)}"],
+            "error": True
         }
 
-async def detect_audio(file_path: str) -> dict:
+async def detect_audio(file_path: str, tier: str = "full") -> dict:
     """Detect deepfakes in audio"""
+    audio_detector = configure_detector(audio_model, "audio", tier)
     try:
-        if audio_model:
+        if audio_detector:
             # Use actual model
-            confidence = await audio_model.predict(file_path)
+            if inference_pool is not None:
+                confidence = await inference_pool.predict("audio", audio_detector, file_path)
+            else:
+                confidence = await audio_detector.predict(file_path)
         else:
             # Mock detection for testing
             confidence = 0.25  # Mock result
         
-        # Determine classification
-        if confidence > 0.7:
-            result = "deepfake"
-            details = [
-                "High confidence audio deepfake detection",
-                "Synthetic voice patterns detected",
-                "Voice cloning signatures found",
-                "Unnatural speech characteristics identified"
-            ]
-        elif confidence > 0.3:
-            result = "suspicious"
-            details = [
-                "Medium confidence audio detection",
-                "Some suspicious patterns detected",
-                "Requires audio expert review",
-                "Minor processing artifacts found"
-            ]
-        else:
-            result = "authentic"
-            details = [
-                "No audio manipulation detected",
-                "Natural speech patterns",
-                "Consistent audio quality",
-                "Authentic recording characteristics"
-            ]
+        return verdict("audio", confidence)
         
+    except Exception as e:
+        logger.error(f"Audio detection error: {e}")
         return {
-            "result": result,
-            "confidence": float(confidence),
-            "details": details
+            "result": "suspicious",
+            "confidence": 0.5,
+            "details": [f"Audio detection error: {str(e)}"],
+            "error": True
         }
+
+def fuse_scores(video_confidence: float, audio_confidence: Optional[float]) -> float:
+    """Combine frame and soundtrack scores into one deepfake probability"""
+    if audio_confidence is None:
+        return video_confidence
+    
+    # Weighted average, but a confident hit in either track is not diluted
+    weighted = 0.6 * video_confidence + 0.4 * audio_confidence
+    strongest = max(video_confidence, audio_confidence)
+    return strongest if strongest > DEEPFAKE_THRESHOLD else weighted
+
+async def detect_audiovisual(file_path: str, tier: str = "full") -> dict:
+    """Detect deepfakes in a video's frames and soundtrack from a single upload"""
+    video_detector = configure_detector(video_model, "video", tier)
+    audio_detector = configure_detector(audio_model, "audio", tier)
+    try:
+        # Frames and soundtrack are decoded from the same temp file in
+        # parallel worker threads so neither waits on the other
+        if video_detector and inference_pool is not None:
+            video_task = inference_pool.predict("video", video_detector, file_path)
+        elif video_detector:
+            video_task = asyncio.to_thread(video_detector.predict_sync, file_path)
+        else:
+            video_task = asyncio.sleep(0, result=0.65)  # Mock result
+        if audio_detector:
+            audio_task = asyncio.to_thread(audio_detector.predict_soundtrack, file_path)
+        else:
+            audio_task = asyncio.sleep(0, result=0.25)  # Mock result
+        
+        async def soundtrack():
+            # A failed soundtrack still leaves the frames to go on
+            try:
+                return await audio_task, None
+            except Exception as e:
+                logger.error(f"Soundtrack analysis error: {e}")
+                return None, e
+        
+        video_confidence, (audio_confidence, audio_error) = await asyncio.gather(
+            video_task, soundtrack()
+        )
+        confidence = fuse_scores(float(video_confidence), audio_confidence)
+        
+        result = verdict("audiovisual", confidence)
+        result["details"].append(f"Video frames score: {video_confidence:.2f}")
+        if audio_error is not None:
+            # A frames-only verdict for a video whose soundtrack was never checked
+            result["details"].append(
+                f"Soundtrack analysis failed ({audio_error}), verdict based on frames only"
+            )
+            result["error"] = True
+        elif audio_confidence is None:
+            result["details"].append("No soundtrack found, verdict based on frames only")
+        else:
+            result["details"].append(f"Soundtrack score: {audio_confidence:.2f}")
+        
+        result["modality_scores"] = {
+            "video": float(video_confidence),
+            "audio": None if audio_confidence is None else float(audio_confidence)
+        }
+        return result
         
     except Exception as e:
-        logger.error(f"Audio detection error: {e}")
+        logger.error(f"Audio-visual detection error: {e}")
         return {
             "result": "suspicious",
             "confidence": 0.5,
-            "details": [f"Audio detection error: {str(e)}"]
+            "details": [f"Audio-visual detection error: {str(e)}"],
+            "error": True
         }
 
 if __name__ == "__main__":
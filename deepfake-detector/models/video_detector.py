@@ -8,6 +8,9 @@ import logging
 from typing import Optional, List
 import numpy as np
 
+from services.profiling import stage
+from services.model_cache import OnnxModel, load_onnx_model
+
 logger = logging.getLogger(__name__)
 
 class VideoDetector:
@@ -18,6 +21,7 @@ class VideoDetector:
         self.model_path = model_path
         self.is_loaded = False
         self.frame_rate = 1  # Frames per second to sample
+        self.max_frames = 30  # Maximum number of sampled frames per video
         
     async def predict(self, video_path: str) -> float:
         """
@@ -29,32 +33,123 @@ class VideoDetector:
         Returns:
             float: Deepfake probability (0.0 = authentic, 1.0 = deepfake)
         """
+        return self.predict_sync(video_path)
+    
+    def predict_sync(self, video_path: str) -> float:
+        """
+        Blocking variant of predict() for use from worker threads
+        
+        Args:
+            video_path: Path to the video file
+            
+        Returns:
+            float: Deepfake probability (0.0 = authentic, 1.0 = deepfake)
+            
+        Raises:
+            Exception: If decoding or inference fails, so callers never
+                mistake a failure for a real score
+        """
         if not self.is_loaded:
             logger.warning("Model not loaded, using mock prediction")
             return 0.65  # Mock result for testing
             
         try:
-            # Extract frames from video
-            frames = self._extract_frames(video_path)
+            return self.infer(self.preprocess(video_path))
             
-            if not frames:
-                logger.warning("No frames extracted, using mock prediction")
-                return 0.5
-            
-            # Run inference on frames
-            predictions = []
+        except Exception as e:
+            logger.error(f"Video prediction error: {e}")
+            raise
+    
+    def preprocess(self, video_path: str) -> np.ndarray:
+        """Decode sampled frames into a (num_frames, 224, 224, 3) float32 array"""
+        with stage("video_decode"):
+            frames = self._extract_frames(video_path)
+        
+        if not frames:
+            return np.empty((0, 224, 224, 3), dtype=np.float32)
+        return np.stack(frames, axis=0)
+    
+    def infer(self, frames: np.ndarray) -> float:
+        """Score frames produced by preprocess()"""
+        if len(frames) == 0:
+            raise ValueError("No frames could be decoded from the video")
+        
+        # Run inference on frames
+        predictions = []
+        with stage("video_inference"):
             for frame in frames:
                 prediction = self._run_inference_on_frame(frame)
                 predictions.append(prediction)
+        
+        # Aggregate predictions (average for now, could use more sophisticated methods)
+        return float(np.mean(predictions))
+    
+    def infer_batch(self, clips: List[np.ndarray]) -> List[float]:
+        """Score several preprocess() outputs with a single model call over all their frames"""
+        counts = [len(clip) for clip in clips]
+        non_empty = [clip for clip in clips if len(clip)]
+        if not non_empty:
+            return [0.5] * len(clips)
+        
+        with stage("video_inference"):
+            frame_scores = self._run_inference_on_frames(np.concatenate(non_empty, axis=0))
+        
+        # Split per-frame scores back into clips and average each
+        results = []
+        offset = 0
+        for count in counts:
+            if count == 0:
+                logger.warning("No frames extracted, using mock prediction")
+                results.append(0.5)
+                continue
+            results.append(float(np.mean(frame_scores[offset:offset + count])))
+            offset += count
+        return results
+    
+    def warm_up(self) -> bool:
+        """
+        Run a synthetic clip through frame extraction and inference before serving traffic
+        
+        Returns:
+            bool: True if the synthetic input went through without errors
+        """
+        try:
+            import cv2
+            import tempfile
             
-            # Aggregate predictions (average for now, could use more sophisticated methods)
-            final_prediction = np.mean(predictions)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                video_path = os.path.join(tmp_dir, "warmup.mp4")
+                writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (224, 224))
+                
+                if writer.isOpened():
+                    # Two seconds at 30 fps yields two sampled frames at 1 fps
+                    for _ in range(60):
+                        writer.write(np.random.randint(0, 256, (224, 224, 3), dtype=np.uint8))
+                    writer.release()
+                    self.predict_sync(video_path)
+                elif self.is_loaded:
+                    # No encoder available, warm the model on a bare frame instead
+                    self._run_inference_on_frame(np.zeros((224, 224, 3), dtype=np.float32))
             
-            return float(final_prediction)
+            return True
             
         except Exception as e:
-            logger.error(f"Video prediction error: {e}")
-            return 0.5  # Default to suspicious on error
+            logger.warning(f"Video warm-up failed: {e}")
+            return False
+    
+    def prepare_frame(self, frame: np.ndarray) -> np.ndarray:
+        """Convert a decoded BGR frame into a normalized 224x224 RGB model input"""
+        import cv2
+        
+        # Convert BGR to RGB
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        
+        # Resize frame for model input
+        target_size = (224, 224)
+        frame_resized = cv2.resize(frame_rgb, target_size)
+        
+        # Normalize pixel values
+        return frame_resized.astype(np.float32) / 255.0
     
     def _extract_frames(self, video_path: str) -> List[np.ndarray]:
         """Extract frames from video for analysis"""
@@ -82,27 +177,19 @@ class VideoDetector:
             
             frame_count = 0
             while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # Sample frames based on interval
+                # Sample frames based on interval; skipped frames are only
+                # grabbed, never converted and copied out of the decoder
                 if frame_count % frame_interval == 0:
-                    # Convert BGR to RGB
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    
-                    # Resize frame for model input
-                    target_size = (224, 224)
-                    frame_resized = cv2.resize(frame_rgb, target_size)
-                    
-                    # Normalize pixel values
-                    frame_normalized = frame_resized.astype(np.float32) / 255.0
-                    
-                    frames.append(frame_normalized)
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    frames.append(self.prepare_frame(frame))
                     
                     # Limit number of frames to process
-                    if len(frames) >= 30:  # Max 30 frames
+                    if len(frames) >= self.max_frames:
                         break
+                elif not cap.grab():
+                    break
                 
                 frame_count += 1
             
@@ -123,6 +210,8 @@ class VideoDetector:
             
             # Add batch dimension
             frame_batch = np.expand_dims(frame, axis=0)
+            if isinstance(self.model, OnnxModel):
+                return float(self.model.predict(frame_batch)[0])
             
             # This is a placeholder - replace with actual model inference
             # For example, with TensorFlow/Keras:
@@ -140,7 +229,26 @@ class VideoDetector:
             
         except Exception as e:
             logger.error(f"Frame inference error: {e}")
-            return 0.5
+            raise
+    
+    def _run_inference_on_frames(self, frames: np.ndarray) -> np.ndarray:
+        """Run model inference on a (N, 224, 224, 3) batch of frames, one score per frame"""
+        try:
+            if self.model is None:
+                raise ValueError("Model not loaded")
+            if isinstance(self.model, OnnxModel):
+                return self.model.predict(frames)
+            
+            # This is a placeholder - replace with actual model inference
+            # For example, with TensorFlow/Keras:
+            # return self.model.predict(frames)[:, 0]
+            
+            # Mock inference for now - return slightly varied results
+            return 0.65 + np.random.uniform(-0.1, 0.1, len(frames))
+            
+        except Exception as e:
+            logger.error(f"Frame batch inference error: {e}")
+            raise
     
     def _run_inference_on_video_clip(self, frames: List[np.ndarray]) -> float:
         """Run inference on entire video clip (for models that support temporal analysis)"""
@@ -181,7 +289,9 @@ def load_video_model(model_path: Optional[str] = None) -> VideoDetector:
         detector = VideoDetector(model_path)
         
         # Try to load different model types
-        if _try_load_lipforensics(detector, model_path):
+        if load_onnx_model(detector, model_path):
+            logger.info("ONNX video model loaded successfully")
+        elif _try_load_lipforensics(detector, model_path):
             logger.info("LipForensics model loaded successfully")
         elif _try_load_xception_video(detector, model_path):
             logger.info("XceptionNet video model loaded successfully")
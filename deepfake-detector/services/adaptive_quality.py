@@ -0,0 +1,178 @@
+"""
+Load-Adaptive Analysis Quality
+Watches the service's own queue depth and latency and, when it is
+overloaded, scales down the most expensive analysis parameters instead of
+letting requests time out. Full quality is restored once pressure drops.
+"""
+
+import os
+import copy
+import time
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+TIER_ORDER = ["full", "reduced", "minimal"]
+
+# Detector attributes overridden per tier ("full" keeps the detector defaults).
+# Audio decodes less of the file but keeps the model's fixed input length.
+TIERS: Dict[str, Dict[str, dict]] = {
+    "full": {},
+    "reduced": {
+        "video": {"frame_rate": 0.5, "max_frames": 15},
+        "audio": {"max_duration": 6.0},
+    },
+    "minimal": {
+        "video": {"frame_rate": 0.25, "max_frames": 8},
+        "audio": {"max_duration": 4.0},
+    },
+}
+
+
+def configure_detector(detector, kind: str, tier: str):
+    """
+    Return a detector set up for an analysis tier
+
+    Degraded tiers get a shallow copy that shares the loaded model but has
+    its own sampling parameters, so concurrent requests on different tiers
+    never see each other's settings.
+    """
+    overrides = TIERS.get(tier, {}).get(kind)
+    if detector is None or not overrides:
+        return detector
+
+    configured = copy.copy(detector)
+    for name, value in overrides.items():
+        setattr(configured, name, value)
+    return configured
+
+
+class AdaptiveQualityController:
+    """Picks an analysis tier per request from in-flight count and latency"""
+
+    def __init__(self, max_in_flight: int = 8, latency_target_ms: float = 10000.0,
+                 cooldown: float = 30.0, smoothing: float = 0.2):
+        """
+        Args:
+            max_in_flight: Concurrent requests above which quality is reduced
+            latency_target_ms: Smoothed latency above which quality is reduced
+            cooldown: Seconds of low pressure before restoring one tier
+            smoothing: Weight of each new sample in the latency moving average
+        """
+        self.max_in_flight = max_in_flight
+        self.latency_target_ms = latency_target_ms
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+
+        self.in_flight = 0
+        self.latency_ms = 0.0
+        self.level = 0
+        self._changed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def tier(self) -> str:
+        return TIER_ORDER[self.level]
+
+    def _pressure(self) -> int:
+        """Tier level the current load calls for"""
+        if (self.in_flight >= 2 * self.max_in_flight
+                or self.latency_ms >= 2 * self.latency_target_ms):
+            return 2
+        if self.in_flight >= self.max_in_flight or self.latency_ms >= self.latency_target_ms:
+            return 1
+        return 0
+
+    def _update_level(self):
+        now = time.monotonic()
+        pressure = self._pressure()
+
+        if pressure > self.level:
+            # Degrade immediately
+            self.level = pressure
+        elif (pressure < self.level
+              and now - self._changed_at >= self.cooldown
+              and self.latency_ms < 0.7 * self.latency_target_ms
+              and self.in_flight < max(1, self.max_in_flight // 2)):
+            # Recover one step at a time, only once well clear of the thresholds
+            self.level -= 1
+        else:
+            return
+
+        self._changed_at = now
+        logger.warning(
+            f"Analysis tier -> {self.tier} (in flight {self.in_flight}, "
+            f"latency {self.latency_ms:.0f} ms)"
+        )
+
+    @contextmanager
+    def track(self, measure_latency: bool = True):
+        """
+        Count a request as in flight and yield the tier it should use
+
+        Args:
+            measure_latency: Feed the request's duration into the latency
+                average; callers whose duration includes client transfer
+                time pass False and wrap the server-side part in measure()
+
+        Yields:
+            str: Analysis tier name
+        """
+        with self._lock:
+            self.in_flight += 1
+            self._update_level()
+            tier = self.tier
+
+        try:
+            with self.measure() if measure_latency else nullcontext():
+                yield tier
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self._update_level()
+
+    @contextmanager
+    def measure(self):
+        """Add the duration of the enclosed block to the latency average"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                if self.latency_ms == 0.0:
+                    self.latency_ms = elapsed_ms
+                else:
+                    self.latency_ms += self.smoothing * (elapsed_ms - self.latency_ms)
+                self._update_level()
+
+    def snapshot(self) -> dict:
+        """Current state for the health endpoint"""
+        return {
+            "tier": self.tier,
+            "in_flight": self.in_flight,
+            "latency_ms": round(self.latency_ms, 1),
+        }
+
+
+class FixedQualityController(AdaptiveQualityController):
+    """Always serves full quality (adaptive mode disabled)"""
+
+    def _update_level(self):
+        pass
+
+
+def load_quality_controller() -> AdaptiveQualityController:
+    """Build the quality controller from environment configuration"""
+    settings = dict(
+        max_in_flight=int(os.getenv("QUALITY_MAX_IN_FLIGHT", "8")),
+        latency_target_ms=float(os.getenv("QUALITY_LATENCY_TARGET_MS", "10000")),
+        cooldown=float(os.getenv("QUALITY_COOLDOWN_S", "30")),
+    )
+    if os.getenv("QUALITY_ADAPTIVE", "true").lower() in ("0", "false", "no"):
+        logger.info("Adaptive analysis quality disabled")
+        return FixedQualityController(**settings)
+    return AdaptiveQualityController(**settings)
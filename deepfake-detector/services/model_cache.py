@@ -0,0 +1,133 @@
+"""
+Optimized Model Cache
+Persists graph-optimized model artifacts to a local directory so that
+restarts load the already-optimized graph instead of re-running the
+optimization passes on every boot
+"""
+
+import os
+import hashlib
+import logging
+from typing import Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "model_cache"
+
+
+def get_cache_dir() -> str:
+    """Directory holding optimized model artifacts"""
+    cache_dir = os.getenv("MODEL_CACHE_DIR", DEFAULT_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def _cache_key(model_path: str, *parts: str) -> str:
+    """Fingerprint a model file together with the runtime that optimized it"""
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    for part in parts:
+        digest.update(part.encode())
+    return digest.hexdigest()[:16]
+
+
+def create_onnx_session(model_path: str, cache_dir: Optional[str] = None,
+                        providers: Optional[list] = None):
+    """
+    Create an ONNX Runtime session, reusing a cached optimized graph if present
+
+    The first run optimizes the graph with every pass enabled and writes the
+    result next to a fingerprint of the source model, the runtime version and
+    the execution providers. Later runs load that file with optimization
+    disabled, skipping the work entirely.
+
+    Args:
+        model_path: Path to the source .onnx model
+        cache_dir: Cache directory (defaults to MODEL_CACHE_DIR)
+        providers: Execution providers to pass to ONNX Runtime
+
+    Returns:
+        onnxruntime.InferenceSession
+    """
+    import onnxruntime as ort
+
+    providers = providers or ort.get_available_providers()
+    cache_dir = cache_dir or get_cache_dir()
+    key = _cache_key(model_path, ort.__version__, ",".join(providers))
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    cached_path = os.path.join(cache_dir, f"{name}.{key}.opt.onnx")
+
+    options = ort.SessionOptions()
+    if os.path.exists(cached_path):
+        logger.info(f"Loading optimized graph from cache: {cached_path}")
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        try:
+            return ort.InferenceSession(cached_path, sess_options=options, providers=providers)
+        except Exception as e:
+            logger.warning(f"Cached graph unusable, re-optimizing: {e}")
+            os.unlink(cached_path)
+            options = ort.SessionOptions()
+
+    logger.info(f"Optimizing {model_path} and caching to {cached_path}")
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.optimized_model_filepath = cached_path
+    return ort.InferenceSession(model_path, sess_options=options, providers=providers)
+
+
+class OnnxModel:
+    """ONNX Runtime session that returns one deepfake probability per input"""
+
+    def __init__(self, session):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Score a batch whose first axis is the batch dimension
+
+        The model's first output must hold one probability per input, shaped
+        (N,) or (N, 1).
+        """
+        outputs = self.session.run(None, {self.input_name: batch.astype(np.float32)})
+        return np.asarray(outputs[0], dtype=np.float32).reshape(len(batch), -1)[:, 0]
+
+
+def find_onnx_model(model_path: Optional[str]) -> Optional[str]:
+    """Return model_path if it is an .onnx file, or the only .onnx file in that directory"""
+    if not model_path:
+        return None
+    if os.path.isfile(model_path):
+        return model_path if model_path.endswith(".onnx") else None
+    if not os.path.isdir(model_path):
+        return None
+
+    candidates = sorted(name for name in os.listdir(model_path) if name.endswith(".onnx"))
+    if len(candidates) > 1:
+        logger.warning(f"Several ONNX models in {model_path}, using {candidates[0]}")
+    return os.path.join(model_path, candidates[0]) if candidates else None
+
+
+def load_onnx_model(detector, model_path: Optional[str]) -> bool:
+    """
+    Attach an ONNX model to a detector if model_path holds one
+
+    The session comes from create_onnx_session, so the optimized graph is
+    reused across restarts.
+
+    Returns:
+        True if the detector now has an ONNX model
+    """
+    onnx_path = find_onnx_model(model_path)
+    if onnx_path is None:
+        return False
+
+    try:
+        detector.model = OnnxModel(create_onnx_session(onnx_path))
+    except Exception as e:
+        logger.error(f"Failed to load ONNX model {onnx_path}: {e}")
+        return False
+    detector.is_loaded = True
+    return True
@@ -0,0 +1,350 @@
+"""
+Versioned Model Registry
+Model versions live in MODEL_REGISTRY_DIR/<kind>/<version>/. A version is
+loaded and warmed up on a background thread (and in any inference worker
+processes) and then swapped in with a single reference assignment, so
+requests already running finish on the model they started with and no
+request waits for a load. A candidate
+version can also run in shadow: it rescores a sample of live uploads on a
+low-priority thread after the serving model has answered, and its
+agreement with the serving model is tracked for comparison.
+"""
+
+import os
+import json
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from services.adaptive_quality import configure_detector
+from services.verdict import classify
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("image", "video", "audio")
+DEFAULT_VERSION = "default"  # Loader defaults, no explicit weights directory
+
+
+def load_detector(kind: str, model_path: Optional[str] = None):
+    """
+    Load one detector (callers run its warm_up() and check the result)
+
+    Args:
+        kind: "image", "video" or "audio"
+        model_path: Weights directory passed to the model loader
+    """
+    if kind == "image":
+        from models.image_detector import load_image_model as loader
+    elif kind == "video":
+        from models.video_detector import load_video_model as loader
+    elif kind == "audio":
+        from models.audio_detector import load_audio_model as loader
+    else:
+        raise ValueError(f"Unknown model kind: {kind}")
+
+    return loader(model_path)
+
+
+def _lower_thread_priority():
+    """Deprioritise the calling thread (Linux schedules threads individually)"""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError) as e:
+        logger.debug(f"Could not lower shadow thread priority: {e}")
+
+
+class ShadowModel:
+    """A candidate version scoring sampled traffic next to the serving model"""
+
+    def __init__(self, version: str, detector, sample_rate: float):
+        self.version = version
+        self.detector = detector
+        self.sample_rate = sample_rate
+        self.scored = 0
+        self.agreed = 0
+        self.dropped = 0
+        self.abs_diff_sum = 0.0
+        self.max_abs_diff = 0.0
+
+    def record(self, serving: float, candidate: float):
+        diff = abs(candidate - serving)
+        self.scored += 1
+        self.agreed += int(classify(candidate) == classify(serving))
+        self.abs_diff_sum += diff
+        self.max_abs_diff = max(self.max_abs_diff, diff)
+
+    def snapshot(self) -> dict:
+        return {
+            "version": self.version,
+            "sample_rate": self.sample_rate,
+            "scored": self.scored,
+            "dropped": self.dropped,
+            "verdict_agreement": round(self.agreed / self.scored, 4) if self.scored else None,
+            "mean_abs_diff": round(self.abs_diff_sum / self.scored, 4) if self.scored else None,
+            "max_abs_diff": round(self.max_abs_diff, 4),
+        }
+
+
+class ModelRegistry:
+    """Tracks active model versions, swaps them without downtime and runs shadows"""
+
+    def __init__(self, root: str, on_swap: Callable[[str, object], None],
+                 on_prepare: Optional[Callable[[str, Optional[str]], None]] = None,
+                 shadow_workers: int = 1, max_shadow_pending: int = 8,
+                 warm_up: bool = True):
+        """
+        Args:
+            root: Directory holding <kind>/<version>/ weight directories
+            on_swap: Called with (kind, detector) to publish a newly loaded model
+            on_prepare: Called with (kind, model_path) before a swap so other
+                consumers (inference workers) can load the version first;
+                raising aborts the swap
+            shadow_workers: Threads scoring shadow samples
+            max_shadow_pending: Samples queued for shadow scoring before new
+                ones are dropped (each holds its staged upload until scored)
+            warm_up: Warm up versions before swapping them in
+        """
+        self.root = root
+        self.on_swap = on_swap
+        self.on_prepare = on_prepare
+        self.max_shadow_pending = max_shadow_pending
+        self.warm_up = warm_up
+        self.state_path = os.path.join(root, "active.json")
+
+        self.active: Dict[str, str] = {kind: DEFAULT_VERSION for kind in KINDS}
+        self.previous: Dict[str, str] = {}
+        self.loading: Dict[str, str] = {}
+        self.errors: Dict[str, str] = {}
+        self.shadows: Dict[str, ShadowModel] = {}
+
+        self._lock = threading.Lock()
+        self._shadow_pending = 0
+        self._shadow_executor = ThreadPoolExecutor(
+            shadow_workers, thread_name_prefix="shadow", initializer=_lower_thread_priority
+        )
+        self._load_state()
+
+    def versions(self, kind: str) -> List[str]:
+        """Versions available on disk for a model kind"""
+        directory = os.path.join(self.root, kind)
+        found = []
+        if os.path.isdir(directory):
+            found = sorted(
+                name for name in os.listdir(directory)
+                if os.path.isdir(os.path.join(directory, name))
+            )
+        return [DEFAULT_VERSION] + found
+
+    def model_path(self, kind: str, version: str) -> Optional[str]:
+        """Weights directory for a version (None for the loader defaults)"""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown model kind: {kind}")
+        if version == DEFAULT_VERSION:
+            return None
+        if version not in self.versions(kind):
+            raise ValueError(f"No {kind} model version '{version}' in {self.root}")
+        return os.path.join(self.root, kind, version)
+
+    def active_path(self, kind: str) -> Optional[str]:
+        """Weights directory of the active version, for startup loading"""
+        return self.model_path(kind, self.active[kind])
+
+    def activate(self, kind: str, version: str):
+        """
+        Load a version in the background and swap it in when ready
+
+        Raises:
+            ValueError: Unknown kind or version
+            RuntimeError: A load for this kind is already in progress
+        """
+        model_path = self.model_path(kind, version)
+        self._begin_load(kind, version)
+        threading.Thread(
+            target=self._activate, args=(kind, version, model_path),
+            name=f"model-load-{kind}", daemon=True
+        ).start()
+
+    def _begin_load(self, kind: str, version: str):
+        with self._lock:
+            if kind in self.loading:
+                raise RuntimeError(f"{kind} model version '{self.loading[kind]}' is already loading")
+            self.loading[kind] = version
+            self.errors.pop(kind, None)
+
+    def _load(self, kind: str, version: str, model_path: Optional[str]):
+        logger.info(f"Loading {kind} model version '{version}'")
+        detector = load_detector(kind, model_path)
+        if not detector.is_loaded:
+            raise RuntimeError(f"{kind} model version '{version}' did not load")
+        if self.warm_up and not detector.warm_up():
+            raise RuntimeError(f"{kind} model version '{version}' failed its warm-up")
+        return detector
+
+    def _activate(self, kind: str, version: str, model_path: Optional[str]):
+        try:
+            detector = self._load(kind, version, model_path)
+            if self.on_prepare is not None:
+                self.on_prepare(kind, model_path)
+        except Exception as e:
+            logger.error(f"Failed to load {kind} model version '{version}': {e}")
+            with self._lock:
+                self.loading.pop(kind, None)
+                self.errors[kind] = str(e)
+            return
+
+        with self._lock:
+            self.on_swap(kind, detector)
+            self.previous[kind] = self.active[kind]
+            self.active[kind] = version
+            self.loading.pop(kind, None)
+            self._save_state()
+        logger.info(f"Swapped {kind} model to version '{version}' (was '{self.previous[kind]}')")
+
+    def start_shadow(self, kind: str, version: str, sample_rate: float = 0.1):
+        """
+        Load a candidate version in the background and start shadow scoring
+
+        Raises:
+            ValueError: Unknown kind or version
+            RuntimeError: A load for this kind is already in progress
+        """
+        model_path = self.model_path(kind, version)
+        self._begin_load(kind, version)
+        threading.Thread(
+            target=self._start_shadow, args=(kind, version, model_path, sample_rate),
+            name=f"model-load-{kind}", daemon=True
+        ).start()
+
+    def _start_shadow(self, kind: str, version: str, model_path: Optional[str], sample_rate: float):
+        try:
+            detector = self._load(kind, version, model_path)
+        except Exception as e:
+            logger.error(f"Failed to load shadow {kind} model version '{version}': {e}")
+            with self._lock:
+                self.loading.pop(kind, None)
+                self.errors[kind] = str(e)
+            return
+
+        with self._lock:
+            self.shadows[kind] = ShadowModel(version, detector, sample_rate)
+            self.loading.pop(kind, None)
+        logger.info(f"Shadow scoring {kind} model version '{version}' on {sample_rate:.0%} of traffic")
+
+    def stop_shadow(self, kind: str) -> Optional[dict]:
+        """Stop shadow scoring for a kind and return its final comparison"""
+        with self._lock:
+            shadow = self.shadows.pop(kind, None)
+        if shadow is None:
+            return None
+        summary = shadow.snapshot()
+        logger.info(f"Stopped shadow {kind} model: {summary}")
+        return summary
+
+    def shadow(self, kind: str, staged, confidence: float, tier: str = "full") -> bool:
+        """
+        Queue an already answered upload for scoring by the shadow candidate
+
+        Args:
+            kind: Detection type of the upload
+            staged: ScratchFile holding the upload
+            confidence: Score the serving model returned
+            tier: Analysis tier the serving model ran at
+
+        Returns:
+            True if the shadow took ownership of `staged` and will discard it
+        """
+        shadow = self.shadows.get(kind)
+        if shadow is None or random.random() >= shadow.sample_rate:
+            return False
+
+        with self._lock:
+            if self._shadow_pending >= self.max_shadow_pending:
+                shadow.dropped += 1
+                return False
+            self._shadow_pending += 1
+
+        self._shadow_executor.submit(self._score_shadow, kind, shadow, staged, confidence, tier)
+        return True
+
+    def _score_shadow(self, kind: str, shadow: ShadowModel, staged, confidence: float, tier: str):
+        try:
+            # Same tier as the serving model so the comparison is like for like
+            detector = configure_detector(shadow.detector, kind, tier)
+            candidate = detector.predict_sync(staged.path)
+            with self._lock:
+                shadow.record(confidence, candidate)
+            logger.info(
+                f"Shadow {kind} '{shadow.version}': {candidate:.3f} vs serving "
+                f"'{self.active[kind]}': {confidence:.3f}"
+            )
+        except Exception as e:
+            logger.error(f"Shadow {kind} scoring error: {e}")
+        finally:
+            staged.discard()
+            with self._lock:
+                self._shadow_pending -= 1
+
+    def status(self) -> dict:
+        """Versions, loads in progress and shadow comparisons per kind"""
+        with self._lock:
+            return {
+                kind: {
+                    "active": self.active[kind],
+                    "previous": self.previous.get(kind),
+                    "available": self.versions(kind),
+                    "loading": self.loading.get(kind),
+                    "last_error": self.errors.get(kind),
+                    "shadow": self.shadows[kind].snapshot() if kind in self.shadows else None,
+                }
+                for kind in KINDS
+            }
+
+    def _load_state(self):
+        """Restore the active versions recorded by an earlier run"""
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to read model registry state: {e}")
+            return
+
+        for kind, version in state.items():
+            if kind not in KINDS:
+                continue
+            if version in self.versions(kind):
+                self.active[kind] = version
+            else:
+                logger.warning(f"Recorded {kind} model version '{version}' is missing, using default")
+
+    def _save_state(self):
+        """Record the active versions atomically (caller holds the lock)"""
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.active, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.error(f"Failed to save model registry state: {e}")
+
+    def close(self):
+        """Abandon queued shadow samples (scratch cleanup removes their files)"""
+        self._shadow_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def load_model_registry(on_swap: Callable[[str, object], None],
+                        on_prepare: Optional[Callable[[str, Optional[str]], None]] = None) -> ModelRegistry:
+    """Build the model registry from environment configuration"""
+    default_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "weights")
+    return ModelRegistry(
+        root=os.getenv("MODEL_REGISTRY_DIR", default_root),
+        on_swap=on_swap,
+        on_prepare=on_prepare,
+        shadow_workers=int(os.getenv("SHADOW_WORKERS", "1")),
+        max_shadow_pending=int(os.getenv("SHADOW_MAX_PENDING", "8")),
+        warm_up=os.getenv("WARMUP_ENABLED", "true").lower() not in ("0", "false", "no"),
+    )
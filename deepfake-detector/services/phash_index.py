@@ -0,0 +1,348 @@
+"""
+Perceptual Hash Near-Duplicate Index
+Remembers verdicts for previously analysed media so that re-encoded, resized
+or screenshotted copies can reuse them instead of running inference again
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import Optional, List, Dict, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+MAX_KEYFRAMES = 8  # Keyframes hashed per video
+
+# Detection types whose verdict depends only on what is hashed. Audiovisual
+# verdicts are excluded: keyframe hashes cannot tell a re-upload of a real
+# clip from the same clip with a cloned or dubbed soundtrack.
+INDEXED_TYPES = ("image", "video")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count("1")
+
+
+def phash_from_array(image: np.ndarray) -> int:
+    """
+    Compute a 64-bit DCT perceptual hash
+
+    Args:
+        image: Image array (grayscale, RGB or BGR)
+
+    Returns:
+        int: 64-bit perceptual hash
+    """
+    import cv2
+
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+    # Shrink to 32x32 so only coarse structure survives
+    small = cv2.resize(image, (32, 32), interpolation=cv2.INTER_AREA)
+    dct = cv2.dct(small.astype(np.float32))
+
+    # Keep the low-frequency 8x8 block and threshold on its median,
+    # ignoring the DC term which only encodes overall brightness
+    low = dct[:8, :8].flatten()
+    median = np.median(low[1:])
+    bits = low > median
+
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def compute_image_hashes(image_path: str) -> List[int]:
+    """Compute the perceptual hash of an image file"""
+    try:
+        from PIL import Image
+
+        image = np.array(Image.open(image_path).convert("L"))
+        return [phash_from_array(image)]
+
+    except Exception as e:
+        logger.warning(f"Image hashing failed: {e}")
+        return []
+
+
+def compute_video_hashes(video_path: str, max_keyframes: int = MAX_KEYFRAMES) -> List[int]:
+    """Compute perceptual hashes for evenly spaced keyframes of a video"""
+    try:
+        import cv2
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            logger.warning(f"Could not open video for hashing: {video_path}")
+            return []
+
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total_frames <= 0:
+            cap.release()
+            return []
+
+        # Skip the very first and last frames, which are often black
+        count = min(max_keyframes, total_frames)
+        positions = np.linspace(0, total_frames - 1, count + 2)[1:-1].astype(int)
+
+        hashes = []
+        for position in positions:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(position))
+            ret, frame = cap.read()
+            if not ret:
+                continue
+            hashes.append(phash_from_array(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)))
+
+        cap.release()
+        return hashes
+
+    except Exception as e:
+        logger.warning(f"Video hashing failed: {e}")
+        return []
+
+
+class BKTree:
+    """Burkhard-Keller tree over Hamming distance for radius queries"""
+
+    def __init__(self):
+        # Each node is [hash, entry_ids, {distance: child}]
+        self.root = None
+        self.size = 0
+
+    def add(self, value: int, entry_id: int):
+        """Insert a hash pointing at an index entry"""
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [entry_id], {}]
+            return
+
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(entry_id)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [entry_id], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, int]]:
+        """Return (distance, entry_id) pairs within radius of value"""
+        matches = []
+        if self.root is None:
+            return matches
+
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= radius:
+                matches.extend((distance, entry_id) for entry_id in node[1])
+
+            # Triangle inequality bounds which subtrees can still match
+            low, high = distance - radius, distance + radius
+            for child_distance, child in node[2].items():
+                if low <= child_distance <= high:
+                    stack.append(child)
+
+        return matches
+
+
+class PerceptualHashIndex:
+    """In-memory near-duplicate index with optional JSON persistence"""
+
+    def __init__(self, max_distance: int = 8, max_entries: int = 100000,
+                 persist_path: Optional[str] = None):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self._lock = threading.Lock()
+        self._entries: Dict[int, dict] = {}
+        self._trees: Dict[str, BKTree] = {}
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, media_type: str, hashes: List[int], verdict: dict):
+        """
+        Record the verdict produced for a piece of media
+
+        Args:
+            media_type: "image" or "video" (see INDEXED_TYPES)
+            hashes: Perceptual hashes (one per image, one per keyframe for video)
+            verdict: Detection result dict returned by /detect; failed
+                detections (marked "error") and verdicts from a degraded
+                analysis_tier are never recorded, so reuse is always full quality
+        """
+        if not hashes or verdict.get("error") or media_type not in INDEXED_TYPES:
+            return
+        if verdict.get("analysis_tier", "full") != "full":
+            return
+
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict_oldest()
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "media_type": media_type,
+                "hashes": list(hashes),
+                "verdict": verdict,
+            }
+            tree = self._trees.setdefault(media_type, BKTree())
+            for value in hashes:
+                tree.add(value, entry_id)
+
+    def lookup(self, media_type: str, hashes: List[int]) -> Optional[Tuple[dict, int]]:
+        """
+        Find an earlier verdict for near-duplicate media
+
+        A video matches when at least half of its keyframes fall within
+        max_distance of keyframes belonging to the same earlier entry.
+
+        Returns:
+            (verdict, distance) for the best match, or None
+        """
+        if not hashes:
+            return None
+
+        with self._lock:
+            tree = self._trees.get(media_type)
+            if tree is None:
+                return None
+
+            # Per entry: number of query hashes matched and their summed distance
+            votes: Dict[int, List[int]] = {}
+            for value in hashes:
+                best: Dict[int, int] = {}
+                for distance, entry_id in tree.search(value, self.max_distance):
+                    if entry_id in self._entries and distance < best.get(entry_id, HASH_BITS + 1):
+                        best[entry_id] = distance
+                for entry_id, distance in best.items():
+                    tally = votes.setdefault(entry_id, [0, 0])
+                    tally[0] += 1
+                    tally[1] += distance
+
+            required = max(1, (len(hashes) + 1) // 2)
+            candidates = [
+                (-tally[0], tally[1] / tally[0], entry_id)
+                for entry_id, tally in votes.items()
+                if tally[0] >= required
+            ]
+            if not candidates:
+                return None
+
+            _, mean_distance, entry_id = min(candidates)
+            return dict(self._entries[entry_id]["verdict"]), int(round(mean_distance))
+
+    def discard(self, media_types: List[str]):
+        """Forget every verdict recorded for the given media types"""
+        with self._lock:
+            keep = [
+                entry_id for entry_id, entry in self._entries.items()
+                if entry["media_type"] not in media_types
+            ]
+            removed = len(self._entries) - len(keep)
+            self._rebuild(keep)
+        if removed:
+            logger.info(f"Perceptual hash index dropped {removed} {'/'.join(media_types)} entries")
+
+    def _evict_oldest(self):
+        """Drop the oldest half of the entries and rebuild the trees"""
+        self._rebuild(sorted(self._entries)[len(self._entries) // 2:])
+        logger.info(f"Perceptual hash index evicted to {len(self._entries)} entries")
+
+    def _rebuild(self, keep: List[int]):
+        """Keep only the given entries and rebuild the trees (caller holds the lock)"""
+        self._entries = {entry_id: self._entries[entry_id] for entry_id in keep}
+        self._trees = {}
+        for entry_id, entry in self._entries.items():
+            tree = self._trees.setdefault(entry["media_type"], BKTree())
+            for value in entry["hashes"]:
+                tree.add(value, entry_id)
+
+    def save(self, path: Optional[str] = None):
+        """Write the index to disk atomically"""
+        path = path or self.persist_path
+        if not path:
+            return
+
+        with self._lock:
+            payload = {
+                "version": 1,
+                "entries": [
+                    {
+                        "media_type": entry["media_type"],
+                        "hashes": [format(value, "016x") for value in entry["hashes"]],
+                        "verdict": entry["verdict"],
+                    }
+                    for _, entry in sorted(self._entries.items())
+                ],
+            }
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved {len(payload['entries'])} perceptual hash entries to {path}")
+
+    def load(self, path: Optional[str] = None):
+        """Load entries previously written by save()"""
+        path = path or self.persist_path
+        if not path or not os.path.exists(path):
+            return
+
+        try:
+            with open(path) as f:
+                payload = json.load(f)
+
+            for entry in payload.get("entries", []):
+                self.add(
+                    entry["media_type"],
+                    [int(value, 16) for value in entry["hashes"]],
+                    entry["verdict"],
+                )
+            logger.info(f"Loaded {len(self._entries)} perceptual hash entries from {path}")
+
+        except Exception as e:
+            logger.error(f"Failed to load perceptual hash index: {e}")
+
+
+def compute_hashes(media_type: str, file_path: str) -> List[int]:
+    """Compute perceptual hashes for a supported media type"""
+    if media_type == "image":
+        return compute_image_hashes(file_path)
+    if media_type == "video":
+        return compute_video_hashes(file_path)
+    return []
+
+
+def load_phash_index() -> Optional[PerceptualHashIndex]:
+    """
+    Build the near-duplicate index from environment configuration
+
+    Returns:
+        PerceptualHashIndex instance, or None when disabled
+    """
+    if os.getenv("PHASH_ENABLED", "true").lower() in ("0", "false", "no"):
+        logger.info("Perceptual hash index disabled")
+        return None
+
+    index = PerceptualHashIndex(
+        max_distance=int(os.getenv("PHASH_MAX_DISTANCE", "8")),
+        max_entries=int(os.getenv("PHASH_MAX_ENTRIES", "100000")),
+        persist_path=os.getenv("PHASH_INDEX_PATH") or None,
+    )
+    index.load()
+    return index
@@ -0,0 +1,207 @@
+"""
+Per-Request Profiling
+Stage-by-stage timing for every /detect call, an optional cProfile capture
+of the event loop while a request that opts in (header or random sampling)
+runs, and automatic saving of slow-request profiles to a rotating local
+directory
+"""
+
+import os
+import io
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager, asynccontextmanager
+from typing import Optional, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"  # "1"/"stages" for timings, "full" to add cProfile
+
+_current_profile: contextvars.ContextVar = contextvars.ContextVar("request_profile", default=None)
+
+# cProfile can only be attached once per interpreter at a time
+_cprofile_lock = threading.Lock()
+
+
+class RequestProfile:
+    """Timings (and optionally a cProfile capture) for one request"""
+
+    def __init__(self, label: str, full: bool = False):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.label = label
+        self.stages: List[Tuple[str, float]] = []
+        self.total = 0.0
+        self.cprofile = None
+        self.full = full
+
+    def record(self, name: str, seconds: float):
+        """Add a completed stage (safe to call from worker threads)"""
+        self.stages.append((name, seconds))
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "label": self.label,
+            "total_ms": round(self.total * 1000, 2),
+            "stages": [
+                {"name": name, "ms": round(seconds * 1000, 2)}
+                for name, seconds in self.stages
+            ],
+        }
+
+    def server_timing(self) -> str:
+        """Render stages as a Server-Timing header value"""
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages]
+        parts.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block as a named stage of the current request
+
+    A no-op outside a profiled request, so detectors can be instrumented
+    unconditionally. The context variable is copied into asyncio.to_thread
+    workers, so stages run there are attributed to the right request.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.record(name, time.perf_counter() - start)
+
+
+class Profiler:
+    """Decides which requests to profile and stores the interesting ones"""
+
+    def __init__(self, sample_rate: float = 0.0, slow_ms: float = 0.0,
+                 directory: str = "profiles", keep: int = 50):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.directory = directory
+        self.keep = keep
+        self._save_lock = threading.Lock()
+
+    @asynccontextmanager
+    async def profile_request(self, label: str, header_value: Optional[str] = None,
+                              stages: Optional[List[Tuple[str, float]]] = None):
+        """
+        Profile the enclosed block as one request
+
+        Stage timings belong to this request alone. The cProfile capture
+        does not: it observes the whole event-loop thread from start to end
+        of the request, so it also contains every other request's
+        coroutines that ran in the meantime. Work offloaded with
+        asyncio.to_thread is not in it at all; the stage timings cover it.
+        Saving runs in a worker thread so writing files and formatting
+        pstats never blocks the loop.
+
+        Args:
+            label: Short description stored with saved profiles
+            header_value: Value of the X-Profile request header, if any
+            stages: (name, seconds) stages already spent on this request
+                before the block, such as staging its upload. They are
+                recorded first and count toward the total and the slow
+                threshold.
+
+        Yields:
+            RequestProfile collecting this request's stages
+        """
+        requested = (header_value or "").strip().lower()
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        full = requested == "full" or sampled
+
+        profile = RequestProfile(label, full=full)
+        for name, seconds in stages or ():
+            profile.record(name, seconds)
+        earlier = sum(seconds for _, seconds in stages or ())
+        token = _current_profile.set(profile)
+        profiler = self._start_cprofile() if full else None
+        start = time.perf_counter()
+
+        try:
+            yield profile
+        finally:
+            profile.total = earlier + time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                profile.cprofile = profiler
+                _cprofile_lock.release()
+            _current_profile.reset(token)
+
+            slow = self.slow_ms > 0 and profile.total * 1000 >= self.slow_ms
+            if slow or sampled or profiler is not None:
+                if slow:
+                    logger.warning(f"Slow request {profile.id} ({label}): {profile.total * 1000:.0f} ms")
+                await asyncio.to_thread(self.save, profile)
+
+    def _start_cprofile(self):
+        """Attach cProfile unless another request already holds it"""
+        import cProfile
+
+        if not _cprofile_lock.acquire(blocking=False):
+            logger.info("cProfile busy with another request, recording stages only")
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def save(self, profile: RequestProfile):
+        """Write a profile to the rotating directory"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            base = os.path.join(self.directory, profile.id)
+
+            with open(f"{base}.json", "w") as f:
+                json.dump(profile.to_dict(), f, indent=2)
+
+            if profile.cprofile is not None:
+                import pstats
+
+                profile.cprofile.dump_stats(f"{base}.prof")
+                summary = io.StringIO()
+                pstats.Stats(profile.cprofile, stream=summary).sort_stats("cumulative").print_stats(40)
+                with open(f"{base}.txt", "w") as f:
+                    f.write(summary.getvalue())
+
+            self._rotate()
+
+        except Exception as e:
+            logger.error(f"Failed to save profile {profile.id}: {e}")
+
+    def _rotate(self):
+        """Keep only the newest `keep` profiles"""
+        with self._save_lock:
+            ids = sorted({
+                os.path.splitext(name)[0]
+                for name in os.listdir(self.directory)
+                if name.endswith((".json", ".prof", ".txt"))
+            })
+            for stale in ids[:-self.keep] if self.keep > 0 else []:
+                for ext in (".json", ".prof", ".txt"):
+                    try:
+                        os.unlink(os.path.join(self.directory, stale + ext))
+                    except FileNotFoundError:
+                        pass
+
+
+def load_profiler() -> Profiler:
+    """Build the request profiler from environment configuration"""
+    return Profiler(
+        sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+        slow_ms=float(os.getenv("PROFILE_SLOW_MS", "5000")),
+        directory=os.getenv("PROFILE_DIR", "profiles"),
+        keep=int(os.getenv("PROFILE_KEEP", "50")),
+    )
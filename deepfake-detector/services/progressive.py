@@ -0,0 +1,281 @@
+"""
+Progressive Video Analysis
+Scores video frames while the upload is still arriving. Bytes are appended
+to a scratch file that a decoder thread re-opens as it grows, scoring newly
+decodable frames and publishing interim confidence to Server-Sent Event
+subscribers. Works for streamable containers such as fragmented MP4, whose
+index sits at the front of the file.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Callable
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL = 60.0  # Seconds a finished session stays available to late subscribers
+SESSION_IDLE_TTL = 600.0  # Seconds an upload may take before its session is dropped
+SUBSCRIBE_IDLE_TIMEOUT = 30.0  # Seconds a subscriber waits for an upload to start
+
+
+class SessionBusyError(RuntimeError):
+    """Raised when an upload targets a session that is already receiving one"""
+
+
+class ScanCapacityError(RuntimeError):
+    """Raised when every progressive scan thread is taken"""
+
+
+class GrowingFile:
+    """Tracks how much of an upload has landed on disk"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = 0
+        self.complete = False
+        self._condition = threading.Condition()
+
+    def grew(self, size: int):
+        with self._condition:
+            self.size = size
+            self._condition.notify_all()
+
+    def finish(self):
+        with self._condition:
+            self.complete = True
+            self._condition.notify_all()
+
+    def wait_for_growth(self, last_size: int, timeout: float = 1.0):
+        """Block until more bytes arrive, the upload completes, or timeout"""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.complete or self.size > last_size, timeout=timeout
+            )
+
+
+def scan_growing_video(detector, growing: GrowingFile,
+                       on_update: Callable[[dict], None],
+                       min_new_bytes: int = 1 << 20) -> Optional[float]:
+    """
+    Score sampled frames of a video that is still being written
+
+    The capture is re-opened whenever at least min_new_bytes have arrived
+    and seeks past the frames already visited, so each frame is decoded
+    roughly once. Sampling follows detector.frame_rate and stops at
+    detector.max_frames, as in VideoDetector.predict.
+
+    Returns:
+        Mean frame score, or None if no frame could be decoded
+    """
+    import cv2
+
+    next_frame = 0
+    frames_scored = 0
+    score_sum = 0.0
+    scanned_size = -1
+
+    while True:
+        complete = growing.complete
+        size = growing.size
+
+        # Wait for a meaningful amount of new data before re-opening
+        if not complete and size - scanned_size < min_new_bytes:
+            growing.wait_for_growth(size)
+            continue
+        scanned_size = size
+
+        cap = cv2.VideoCapture(growing.path)
+        batch = []
+        if cap.isOpened():
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            if fps <= 0:
+                fps = 30  # Default fallback
+            frame_interval = max(1, int(fps / detector.frame_rate))
+
+            if next_frame:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, next_frame)
+
+            while frames_scored + len(batch) < detector.max_frames:
+                if next_frame % frame_interval == 0:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    batch.append(detector.prepare_frame(frame))
+                elif not cap.grab():
+                    break
+                next_frame += 1
+        cap.release()
+
+        if batch:
+            score = detector.infer(np.stack(batch, axis=0))
+            score_sum += score * len(batch)
+            frames_scored += len(batch)
+            on_update({
+                "confidence": score_sum / frames_scored,
+                "frames_analyzed": frames_scored,
+                "bytes_received": size,
+            })
+
+        if complete or frames_scored >= detector.max_frames:
+            break
+
+    if frames_scored == 0:
+        return None
+    return score_sum / frames_scored
+
+
+class ScanExecutor:
+    """
+    Threads reserved for progressive scans
+
+    A scan holds its thread for as long as the upload takes, so scans get
+    their own bounded pool rather than the default executor shared with
+    hashing, preprocessing and profile saves.
+    """
+
+    def __init__(self, workers: int = 4):
+        self.workers = workers
+        self.active = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="progressive-scan")
+
+    @property
+    def saturated(self) -> bool:
+        return self.active >= self.workers
+
+    def submit(self, fn: Callable, *args) -> asyncio.Future:
+        """
+        Run fn(*args) on a scan thread
+
+        Returns:
+            Future awaitable from the calling event loop
+
+        Raises:
+            ScanCapacityError: If every scan thread is busy
+        """
+        with self._lock:
+            if self.active >= self.workers:
+                raise ScanCapacityError(f"All {self.workers} progressive scan threads are busy")
+            self.active += 1
+        return asyncio.wrap_future(self._executor.submit(self._run, fn, *args))
+
+    def _run(self, fn: Callable, *args):
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def load_scan_executor() -> ScanExecutor:
+    """Build the progressive scan pool from environment configuration"""
+    return ScanExecutor(int(os.getenv("PROGRESSIVE_SCAN_WORKERS", "4")))
+
+
+class ProgressSession:
+    """Fan-out of analysis events for one streamed upload"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.events: List[dict] = []
+        self.finished = False
+        self.uploading = False
+        self.created_at = time.monotonic()
+        self.finished_at = 0.0
+        self._subscribers: List[asyncio.Queue] = []
+
+    def publish(self, event: str, data: dict):
+        """Record an event and deliver it to current subscribers (event loop only)"""
+        message = {"event": event, "data": data}
+        self.events.append(message)
+        for queue in self._subscribers:
+            queue.put_nowait(message)
+        if event in ("result", "error"):
+            self.finished = True
+            self.uploading = False
+            self.finished_at = time.monotonic()
+
+    async def subscribe(self, idle_timeout: float = SUBSCRIBE_IDLE_TIMEOUT):
+        """
+        Yield past and future events as SSE-formatted strings
+
+        While an upload is streaming, quiet periods only produce keep-alive
+        comments. If no upload starts within idle_timeout seconds the feed
+        ends with a "timeout" event instead of waiting forever.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for message in self.events:
+            queue.put_nowait(message)
+        self._subscribers.append(queue)
+
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=idle_timeout)
+                except asyncio.TimeoutError:
+                    if self.uploading:
+                        yield ": keep-alive\n\n"
+                        continue
+                    detail = f"No upload started within {idle_timeout:g}s"
+                    yield f"event: timeout\ndata: {json.dumps({'detail': detail})}\n\n"
+                    break
+                yield f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+                if message["event"] in ("result", "error"):
+                    break
+        finally:
+            self._subscribers.remove(queue)
+
+
+class SessionRegistry:
+    """Progress sessions keyed by client-chosen id"""
+
+    def __init__(self):
+        self._sessions: Dict[str, ProgressSession] = {}
+
+    def get_or_create(self, session_id: str) -> ProgressSession:
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = ProgressSession(session_id)
+            self._sessions[session_id] = session
+        return session
+
+    def start_upload(self, session_id: str) -> ProgressSession:
+        """
+        Claim a session for a new upload
+
+        A finished session is replaced by a fresh one so its verdict is not
+        replayed to subscribers of the new upload; a session that has not
+        started yet keeps the subscribers already waiting on it.
+
+        Raises:
+            SessionBusyError: If an upload is already streaming into the session
+        """
+        session = self.get_or_create(session_id)
+        if session.uploading:
+            raise SessionBusyError(f"Session {session_id} is already receiving an upload")
+        if session.finished:
+            session = ProgressSession(session_id)
+            self._sessions[session_id] = session
+        session.uploading = True
+        return session
+
+    def _expire(self):
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if session.finished and now - session.finished_at > SESSION_TTL:
+                del self._sessions[session_id]
+            elif not session.finished and now - session.created_at > SESSION_IDLE_TTL:
+                del self._sessions[session_id]
+
+
+sessions = SessionRegistry()
@@ -0,0 +1,273 @@
+"""
+Scratch Storage for Uploads
+Decoders such as cv2.VideoCapture need a filesystem path, so every upload
+is staged to a file. This keeps those files in memory (a tmpfs directory
+such as /dev/shm, or anonymous memfd files exposed through /proc/self/fd)
+up to a shared quota and spills to disk only beyond it.
+"""
+
+import os
+import errno
+import shutil
+import atexit
+import asyncio
+import logging
+import tempfile
+import threading
+from typing import Optional, BinaryIO
+
+logger = logging.getLogger(__name__)
+
+DIR_PREFIX = "deepfake-scratch-"
+CHUNK_SIZE = 1 << 20
+
+
+class ScratchStorage:
+    """Allocates scratch files in memory within a byte quota, on disk beyond it"""
+
+    def __init__(self, memory_dir: Optional[str] = "/dev/shm", quota_bytes: int = 512 << 20,
+                 disk_dir: Optional[str] = None):
+        """
+        Args:
+            memory_dir: tmpfs directory, "memfd" for anonymous memory files,
+                or None to always use disk
+            quota_bytes: Total bytes all in-memory scratch files may hold
+            disk_dir: Directory for files that do not fit (system temp by default)
+        """
+        self.memory_dir = memory_dir
+        self.quota_bytes = quota_bytes
+        self.used_bytes = 0
+        self._lock = threading.Lock()
+
+        if memory_dir == "memfd" and not hasattr(os, "memfd_create"):
+            logger.warning("memfd_create unavailable, scratch files will use disk")
+            self.memory_dir = None
+        elif memory_dir and memory_dir != "memfd" and not os.access(memory_dir, os.W_OK):
+            logger.warning(f"Scratch memory dir {memory_dir} not writable, using disk")
+            self.memory_dir = None
+
+        # One directory per process so a crashed process's files can be swept
+        self._process_dirs = []
+        self.memory_path = self._make_process_dir(self.memory_dir) if self.memory_dir not in (None, "memfd") else None
+        self.disk_path = self._make_process_dir(disk_dir or tempfile.gettempdir())
+        atexit.register(self.cleanup)
+
+        # The tmpfs may be smaller than the quota, or shared with other users
+        if self.memory_path is not None:
+            stats = os.statvfs(self.memory_path)
+            free = stats.f_bavail * stats.f_frsize
+            if free < self.quota_bytes:
+                logger.warning(
+                    f"Scratch memory quota {self.quota_bytes >> 20} MB exceeds the "
+                    f"{free >> 20} MB free in {self.memory_dir}, using the latter"
+                )
+                self.quota_bytes = free
+
+    def _make_process_dir(self, parent: str) -> str:
+        sweep_stale_dirs(parent)
+        path = os.path.join(parent, f"{DIR_PREFIX}{os.getpid()}")
+        os.makedirs(path, exist_ok=True)
+        self._process_dirs.append(path)
+        return path
+
+    def create(self, suffix: str = "", size_hint: Optional[int] = None) -> "ScratchFile":
+        """
+        Open a new scratch file
+
+        Args:
+            suffix: File extension to keep (decoders may sniff it)
+            size_hint: Expected size in bytes, if known, to decide up front
+                whether the file fits in the memory quota
+
+        Returns:
+            ScratchFile, to be used as a context manager so it is always removed
+        """
+        reserve = size_hint or 0
+        if self.memory_dir and self._reserve(reserve):
+            return ScratchFile(self, suffix, in_memory=True, reserved=reserve)
+        return ScratchFile(self, suffix, in_memory=False)
+
+    def _reserve(self, size: int) -> bool:
+        with self._lock:
+            if self.used_bytes + size > self.quota_bytes:
+                return False
+            self.used_bytes += size
+            return True
+
+    def _release(self, size: int):
+        with self._lock:
+            self.used_bytes = max(0, self.used_bytes - size)
+
+    def cleanup(self):
+        """Remove this process's scratch directories"""
+        for path in self._process_dirs:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class ScratchFile:
+    """A staged upload that lives in memory until it outgrows the quota"""
+
+    def __init__(self, storage: ScratchStorage, suffix: str, in_memory: bool, reserved: int = 0):
+        self.storage = storage
+        self.suffix = suffix
+        self.in_memory = in_memory
+        self.size = 0
+        self._reserved = reserved
+        self._memfd = None
+        self._file = self._open(in_memory)
+
+    def _open(self, in_memory: bool) -> BinaryIO:
+        if in_memory and self.storage.memory_dir == "memfd":
+            self._memfd = os.memfd_create(f"scratch{self.suffix}")
+            self.path = f"/proc/{os.getpid()}/fd/{self._memfd}"
+            return os.fdopen(os.dup(self._memfd), "w+b")
+
+        directory = self.storage.memory_path if in_memory else self.storage.disk_path
+        fd, self.path = tempfile.mkstemp(suffix=self.suffix, dir=directory)
+        return os.fdopen(fd, "w+b")
+
+    def write(self, data: bytes):
+        """Append bytes, spilling to disk if the memory quota or the tmpfs runs out"""
+        if self._write_in_memory(data):
+            return
+        if self.in_memory:
+            self._spill()
+        self._file.write(data)
+        self.size += len(data)
+
+    async def write_async(self, data: bytes):
+        """
+        Append bytes from the event loop
+
+        In-memory writes run inline. A spill, and any write to a file that
+        is already on disk, run in a worker thread.
+        """
+        if not self._write_in_memory(data):
+            await asyncio.to_thread(self.write, data)
+
+    def _write_in_memory(self, data: bytes) -> bool:
+        """Append data if the file is in memory and it fits; otherwise write nothing and return False"""
+        if not self.in_memory:
+            return False
+        if not data:
+            return True
+
+        end = self.size + len(data)
+        if end > self._reserved:
+            if not self.storage._reserve(end - self._reserved):
+                return False
+            self._reserved = end
+        try:
+            # Claim the pages first, so a full tmpfs fails here rather than
+            # part-way through a buffered write
+            os.posix_fallocate(self._file.fileno(), self.size, len(data))
+        except OSError as e:
+            if e.errno != errno.ENOSPC:
+                raise
+            logger.warning(f"Scratch memory is full at {self.size} bytes")
+            return False
+
+        self._file.write(data)
+        self.size = end
+        return True
+
+    def flush(self):
+        self._file.flush()
+
+    async def flush_async(self):
+        """Flush from the event loop, in a worker thread if the file is on disk"""
+        if self.in_memory:
+            self._file.flush()
+        else:
+            await asyncio.to_thread(self._file.flush)
+
+    def _spill(self):
+        """Move what has been written so far to disk and continue there"""
+        self._file.flush()
+        self._file.seek(0)
+        old_file, old_path = self._file, self.path
+
+        self._file = self._open(in_memory=False)
+        shutil.copyfileobj(old_file, self._file, CHUNK_SIZE)
+
+        old_file.close()
+        self._close_memory(old_path)
+        self.in_memory = False
+        logger.info(f"Scratch file ran out of memory at {self.size} bytes, spilled to disk")
+
+    def _close_memory(self, path: str):
+        """Free the in-memory copy and its share of the quota"""
+        if self._memfd is not None:
+            os.close(self._memfd)
+            self._memfd = None
+        else:
+            _unlink(path)
+        self.storage._release(self._reserved)
+        self._reserved = 0
+
+    def discard(self):
+        """Close and delete the file; safe to call more than once"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+
+        if self.in_memory:
+            self._close_memory(self.path)
+        else:
+            _unlink(self.path)
+
+    def __enter__(self) -> "ScratchFile":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.discard()
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Failed to delete scratch file {path}: {e}")
+
+
+def sweep_stale_dirs(parent: str):
+    """Delete scratch directories left behind by processes that no longer exist"""
+    try:
+        names = os.listdir(parent)
+    except OSError:
+        return
+
+    for name in names:
+        if not name.startswith(DIR_PREFIX):
+            continue
+        try:
+            pid = int(name[len(DIR_PREFIX):])
+        except ValueError:
+            continue
+        if pid == os.getpid() or _pid_alive(pid):
+            continue
+        shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+        logger.info(f"Removed stale scratch directory {name}")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def load_scratch_storage() -> ScratchStorage:
+    """Build scratch storage from environment configuration"""
+    memory_dir = os.getenv("SCRATCH_MEMORY_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else "")
+    return ScratchStorage(
+        memory_dir=memory_dir or None,
+        quota_bytes=int(float(os.getenv("SCRATCH_MEMORY_QUOTA_MB", "512")) * (1 << 20)),
+        disk_dir=os.getenv("SCRATCH_DISK_DIR") or None,
+    )
@@ -0,0 +1,506 @@
+"""
+Shared-Memory Inference Transport
+Runs detector inference in separate worker processes. Preprocessed tensors
+are placed in a pool of reusable shared-memory segments and only a small
+descriptor (segment name, shape, dtype) travels through the task queue, so
+decoded frames and waveforms are never pickled across the pipe.
+"""
+
+import os
+import time
+import queue
+import atexit
+import asyncio
+import logging
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from typing import Optional, NamedTuple, Tuple, Dict, List
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Largest routine payload: 30 sampled frames of 224x224x3 float32
+DEFAULT_SLOT_BYTES = 30 * 224 * 224 * 3 * 4
+
+MODEL_KINDS = ("image", "video", "audio")
+READY_ID = 0  # Ack id of a worker's start-up load; load_model() ids start at 1
+
+
+class TensorDescriptor(NamedTuple):
+    """What a worker needs to map a tensor out of shared memory"""
+    segment: str
+    shape: Tuple[int, ...]
+    dtype: str
+    pooled: bool  # False for one-off segments the worker should not keep mapped
+
+
+class SharedMemoryPool:
+    """
+    Fixed set of equally sized shared-memory segments owned by the API process
+
+    Segments are created up front and handed out one tensor at a time. A
+    segment returns to the pool only after its worker has replied, so it is
+    never overwritten while still being read. Payloads larger than a slot,
+    or requests arriving while every slot is busy, get a one-off segment
+    that is unlinked as soon as it is released.
+    """
+
+    def __init__(self, slots: int, slot_bytes: int = DEFAULT_SLOT_BYTES):
+        self.slot_bytes = slot_bytes
+        self._lock = threading.Lock()
+        self._segments: Dict[str, shared_memory.SharedMemory] = {}
+        self._transient: Dict[str, shared_memory.SharedMemory] = {}
+        self._free = []
+        self._closed = False
+
+        for _ in range(slots):
+            segment = shared_memory.SharedMemory(create=True, size=slot_bytes)
+            self._segments[segment.name] = segment
+            self._free.append(segment.name)
+
+        logger.info(f"Created {slots} shared-memory slots of {slot_bytes / 1e6:.1f} MB")
+
+    def put(self, tensor: np.ndarray) -> TensorDescriptor:
+        """Copy a tensor into a free segment and describe where it lives"""
+        tensor = np.ascontiguousarray(tensor)
+        segment = None
+        pooled = False
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Shared-memory pool is closed")
+            if tensor.nbytes <= self.slot_bytes and self._free:
+                segment = self._segments[self._free.pop()]
+                pooled = True
+
+        if segment is None:
+            segment = shared_memory.SharedMemory(create=True, size=max(1, tensor.nbytes))
+            with self._lock:
+                self._transient[segment.name] = segment
+
+        view = np.ndarray(tensor.shape, dtype=tensor.dtype, buffer=segment.buf)
+        view[...] = tensor
+        del view
+
+        return TensorDescriptor(segment.name, tuple(tensor.shape), tensor.dtype.str, pooled)
+
+    def release(self, descriptor: TensorDescriptor, reusable: bool = True):
+        """
+        Return a segment once its worker is done with it
+
+        Args:
+            descriptor: Descriptor returned by put()
+            reusable: False if a worker may still touch the segment (e.g.
+                after a timeout); the slot is then retired rather than reused
+        """
+        with self._lock:
+            if not descriptor.pooled:
+                segment = self._transient.pop(descriptor.segment, None)
+                if segment is not None:
+                    _unlink(segment)
+                return
+            if self._closed:
+                return
+            if reusable:
+                self._free.append(descriptor.segment)
+            else:
+                _unlink(self._segments.pop(descriptor.segment))
+                replacement = shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+                self._segments[replacement.name] = replacement
+                self._free.append(replacement.name)
+
+    def close(self):
+        """Unlink every segment; safe to call more than once"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            segments = list(self._segments.values()) + list(self._transient.values())
+            self._segments, self._transient, self._free = {}, {}, []
+
+        for segment in segments:
+            _unlink(segment)
+
+
+def _unlink(segment: shared_memory.SharedMemory):
+    """Close and remove a segment, tolerating one that is already gone"""
+    try:
+        segment.close()
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Failed to unlink shared memory {segment.name}: {e}")
+
+
+def _prune_retired(attached: Dict[str, shared_memory.SharedMemory]):
+    """
+    Unmap segments the API process has retired since a worker attached them
+
+    A retired slot is unlinked and replaced by a segment with a new name, so
+    workers call this whenever they meet a pooled name they have not seen.
+    """
+    for name in list(attached):
+        try:
+            probe = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            attached.pop(name).close()
+        else:
+            probe.close()
+
+
+class _WorkerModels:
+    """Detectors a worker holds per kind, keyed by weights directory"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._detectors: Dict[str, Dict[Optional[str], object]] = {}
+        self._in_use: Dict[str, Optional[str]] = {}
+
+    def add(self, kind: str, model_path: Optional[str], detector):
+        """
+        Hold a newly loaded version next to the one serving requests
+
+        Older versions are dropped, so a swap keeps at most two per kind and
+        requests still carrying the previous path never force a reload.
+        """
+        with self._lock:
+            serving = self._in_use.setdefault(kind, model_path)
+            held = self._detectors.get(kind, {})
+            self._detectors[kind] = {path: d for path, d in held.items() if path == serving}
+            self._detectors[kind][model_path] = detector
+
+    def get(self, kind: str, model_path: Optional[str]):
+        """Detector for a version, or None if it was never loaded here"""
+        with self._lock:
+            detector = self._detectors.get(kind, {}).get(model_path)
+            if detector is not None:
+                self._in_use[kind] = model_path
+            return detector
+
+
+def _worker_main(task_queue, result_queue, control_queue, ack_queue,
+                 model_paths: Dict[str, Optional[str]]):
+    """Inference worker: load detectors, then score tensors from shared memory"""
+    from services.model_registry import load_detector
+
+    warm_up = os.getenv("WARMUP_ENABLED", "true").lower() not in ("0", "false", "no")
+    models = _WorkerModels()
+    failed = []
+    for kind, model_path in model_paths.items():
+        detector = load_detector(kind, model_path)
+        if warm_up and not detector.warm_up():
+            logger.warning(f"Inference worker {os.getpid()}: {kind} warm-up failed")
+            failed.append(kind)
+        models.add(kind, model_path, detector)
+    ack_queue.put((READY_ID, os.getpid(), f"{', '.join(failed)} warm-up failed" if failed else None))
+
+    def load_pushed_models():
+        """Load versions pushed ahead of a swap while tasks keep being scored"""
+        while True:
+            message = control_queue.get()
+            if message is None:
+                break
+            request_id, kind, model_path = message
+            try:
+                detector = load_detector(kind, model_path)
+                if warm_up and not detector.warm_up():
+                    raise RuntimeError(f"{kind} model warm-up failed")
+                models.add(kind, model_path, detector)
+                ack_queue.put((request_id, os.getpid(), None))
+            except Exception as e:
+                ack_queue.put((request_id, os.getpid(), f"{type(e).__name__}: {e}"))
+
+    threading.Thread(target=load_pushed_models, name="model-load", daemon=True).start()
+    attached: Dict[str, shared_memory.SharedMemory] = {}
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        task_id, kind, model_path, descriptor = task
+        try:
+            detector = models.get(kind, model_path)
+            if detector is None:
+                # Only happens if a version was not pushed through load_model()
+                logger.warning(f"Inference worker {os.getpid()}: loading {kind} model {model_path} on demand")
+                models.add(kind, model_path, load_detector(kind, model_path))
+                detector = models.get(kind, model_path)
+
+            segment = attached.get(descriptor.segment)
+            if segment is None:
+                segment = shared_memory.SharedMemory(name=descriptor.segment)
+                if descriptor.pooled:
+                    _prune_retired(attached)
+                    attached[descriptor.segment] = segment
+
+            tensor = np.ndarray(descriptor.shape, dtype=np.dtype(descriptor.dtype), buffer=segment.buf)
+            value = detector.infer(tensor)
+            del tensor
+
+            if not descriptor.pooled:
+                segment.close()
+            result_queue.put((task_id, float(value), None))
+
+        except Exception as e:
+            result_queue.put((task_id, None, f"{type(e).__name__}: {e}"))
+
+    for segment in attached.values():
+        segment.close()
+
+
+class InferenceWorkerPool:
+    """Dispatches preprocessed tensors to inference worker processes"""
+
+    def __init__(self, workers: int, slots: Optional[int] = None,
+                 slot_bytes: int = DEFAULT_SLOT_BYTES, timeout: float = 120.0,
+                 model_paths: Optional[Dict[str, Optional[str]]] = None,
+                 load_timeout: float = 600.0):
+        """
+        Args:
+            workers: Worker processes to start
+            slots: Reusable shared-memory segments (default 2 per worker)
+            slot_bytes: Size of each reusable segment
+            timeout: Seconds to wait for one inference result
+            model_paths: Weights directory per kind that workers load at
+                start (the registry's active versions; None = loader defaults)
+            load_timeout: Seconds start() and load_model() wait for every worker
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.load_timeout = load_timeout
+        self.segments = SharedMemoryPool(slots or 2 * workers, slot_bytes)
+        model_paths = {kind: (model_paths or {}).get(kind) for kind in MODEL_KINDS}
+
+        # Spawn rather than fork so workers never inherit model or thread state
+        context = mp.get_context("spawn")
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        # Model loads go to every worker, so each has its own control queue
+        self._controls = [context.Queue() for _ in range(workers)]
+        self._acks = context.Queue()
+        self._processes = [
+            context.Process(
+                target=_worker_main,
+                args=(self._tasks, self._results, control, self._acks, model_paths),
+                daemon=True,
+            )
+            for control in self._controls
+        ]
+        self._load_lock = threading.Lock()
+        self._load_id = 0
+        self._pending: Dict[int, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self._pending_lock = threading.Lock()
+        self._next_id = 0
+        self._collector = threading.Thread(target=self._collect_results, daemon=True)
+        self.warmed_up = False
+
+    def start(self) -> bool:
+        """
+        Start the workers and wait until each has loaded and warmed up its models
+
+        Returns:
+            bool: True if every worker is up with all warm-ups passed; also
+                kept as warmed_up
+        """
+        for process in self._processes:
+            process.start()
+        self._collector.start()
+        atexit.register(self.close)
+
+        errors = self._wait_for_acks(READY_ID)
+        self.warmed_up = not errors
+        if errors:
+            logger.warning(f"Inference workers not ready: {'; '.join(errors)}")
+        logger.info(f"Started {self.workers} inference worker processes")
+        return self.warmed_up
+
+    async def predict(self, kind: str, detector, file_path: str) -> float:
+        """
+        Preprocess in this process, then score in a worker via shared memory
+
+        Args:
+            kind: "image", "video" or "audio"
+            detector: Detector whose preprocess() prepares the tensor
+            file_path: Path to the media file
+
+        Returns:
+            float: Deepfake probability
+
+        Raises:
+            Exception: If preprocessing or inference fails or the worker
+                times out, as in-process prediction does
+        """
+        if not detector.is_loaded:
+            return detector.predict_sync(file_path)
+
+        try:
+            tensor = await asyncio.to_thread(detector.preprocess, file_path)
+            return await self.infer(kind, tensor, detector.model_path)
+        except Exception as e:
+            logger.error(f"{kind.capitalize()} worker prediction error: {e!r}")
+            raise
+
+    def load_model(self, kind: str, model_path: Optional[str]):
+        """
+        Load and warm up a model version in every worker ahead of a swap
+
+        Workers load it on a background thread while they keep scoring with
+        their current version, and hold both afterwards, so tasks carrying
+        either path during the swap are served without a reload. Blocks
+        until every live worker has replied.
+
+        Raises:
+            RuntimeError: If a worker fails to load or warm up the version,
+                or does not reply within load_timeout
+        """
+        with self._load_lock:
+            self._load_id += 1
+            request_id = self._load_id
+            live = [
+                control for control, process in zip(self._controls, self._processes)
+                if process.is_alive()
+            ]
+            for control in live:
+                control.put((request_id, kind, model_path))
+
+            errors = self._wait_for_acks(request_id)
+            if errors:
+                raise RuntimeError(f"Inference workers failed to load the {kind} model: {'; '.join(errors)}")
+        logger.info(f"Inference workers loaded {kind} model {model_path or 'defaults'}")
+
+    def _wait_for_acks(self, request_id: int) -> List[str]:
+        """
+        Collect every live worker's reply to a load, for up to load_timeout
+
+        Returns:
+            One message per worker that failed, died or did not reply in time
+        """
+        waiting = {process.pid: process for process in self._processes if process.is_alive()}
+        errors = []
+        deadline = time.monotonic() + self.load_timeout
+        while waiting:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                errors.extend(f"worker {pid}: no reply within {self.load_timeout:.0f}s" for pid in waiting)
+                break
+            try:
+                ack_id, pid, error = self._acks.get(timeout=min(remaining, 1.0))
+            except queue.Empty:
+                # A worker that crashed while loading will never reply
+                for pid, process in list(waiting.items()):
+                    if not process.is_alive():
+                        del waiting[pid]
+                        errors.append(f"worker {pid}: exited with code {process.exitcode}")
+                continue
+            if ack_id != request_id or pid not in waiting:
+                continue  # Late reply to an earlier load that timed out
+            del waiting[pid]
+            if error is not None:
+                errors.append(f"worker {pid}: {error}")
+        return errors
+
+    async def infer(self, kind: str, tensor: np.ndarray, model_path: Optional[str] = None) -> float:
+        """
+        Score an already preprocessed tensor in a worker process
+
+        model_path selects the version, as pushed to workers by load_model(),
+        so requests started before and after a swap each get their own model.
+        """
+        if not any(process.is_alive() for process in self._processes):
+            raise RuntimeError("No inference worker processes are running")
+
+        descriptor = self.segments.put(tensor)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        with self._pending_lock:
+            task_id = self._next_id
+            self._next_id += 1
+            self._pending[task_id] = (loop, future)
+
+        reusable = True
+        try:
+            self._tasks.put((task_id, kind, model_path, descriptor))
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            # The worker may still be reading this segment; never reuse it
+            reusable = False
+            raise asyncio.TimeoutError(f"No inference result within {self.timeout:.0f}s")
+        finally:
+            with self._pending_lock:
+                self._pending.pop(task_id, None)
+            self.segments.release(descriptor, reusable=reusable)
+
+    def _collect_results(self):
+        """Resolve pending futures as workers reply"""
+        while True:
+            try:
+                message = self._results.get()
+            except (EOFError, OSError):
+                break
+            if message is None:
+                break
+
+            task_id, value, error = message
+            with self._pending_lock:
+                pending = self._pending.get(task_id)
+            if pending is None:
+                continue  # Timed out already
+
+            loop, future = pending
+            loop.call_soon_threadsafe(_resolve, future, value, error)
+
+    def close(self):
+        """Stop workers and unlink all shared memory"""
+        if self.segments is None:
+            return
+
+        for control in self._controls:
+            control.put(None)
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+        self._results.put(None)
+        self.segments.close()
+        self.segments = None
+        logger.info("Inference worker pool stopped")
+
+
+def _resolve(future: asyncio.Future, value: Optional[float], error: Optional[str]):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(RuntimeError(f"Inference worker error: {error}"))
+    else:
+        future.set_result(value)
+
+
+def load_inference_pool(model_paths: Optional[Dict[str, Optional[str]]] = None) -> Optional[InferenceWorkerPool]:
+    """
+    Start the inference worker pool from environment configuration
+
+    Args:
+        model_paths: Weights directory per kind for workers to start with
+
+    Returns:
+        InferenceWorkerPool, or None to run inference in-process (the default)
+    """
+    workers = int(os.getenv("INFERENCE_WORKERS", "0"))
+    if workers <= 0:
+        return None
+
+    pool = InferenceWorkerPool(
+        workers,
+        slots=int(os.getenv("SHM_SLOTS", "0")) or None,
+        timeout=float(os.getenv("INFERENCE_TIMEOUT", "120")),
+        model_paths=model_paths,
+    )
+    pool.start()
+    return pool
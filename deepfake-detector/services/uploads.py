@@ -0,0 +1,182 @@
+"""
+Streaming Multipart Uploads
+Starlette's form parser spools file parts over 1 MB to the system temp
+directory before the endpoint runs, so a large upload lands on disk and is
+then copied again into scratch storage. This parses the multipart body as
+it streams in and writes the file part straight into a ScratchFile.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Optional
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from services.scratch import ScratchStorage, ScratchFile
+
+logger = logging.getLogger(__name__)
+
+MAX_FIELD_BYTES = 64 << 10  # Limit for plain (non-file) form fields
+
+
+class UploadError(ValueError):
+    """Raised when a multipart body is malformed or lacks the expected parts"""
+
+
+class StagedUpload:
+    """
+    A multipart upload whose file part has been written to scratch storage
+
+    write_seconds is the time spent writing to scratch storage, including
+    any spill to disk, and excludes waiting on the network.
+    """
+
+    def __init__(self, filename: str, file: ScratchFile, fields: Dict[str, str],
+                 write_seconds: float = 0.0):
+        self.filename = filename
+        self.file = file
+        self.fields = fields
+        self.write_seconds = write_seconds
+
+
+class _UploadReceiver:
+    """Multipart parser callbacks that route the file part into scratch storage"""
+
+    def __init__(self, storage: ScratchStorage, file_field: str, size_hint: Optional[int]):
+        self.storage = storage
+        self.file_field = file_field
+        self.size_hint = size_hint
+        self.fields: Dict[str, str] = {}
+        self.filename: Optional[str] = None
+        self.file: Optional[ScratchFile] = None
+        self.write_seconds = 0.0
+
+        self._name = ""
+        self._disposition = b""
+        self._header_name = b""
+        self._header_value = b""
+        self._data = bytearray()
+        self._writing: Optional[ScratchFile] = None
+        # File data from the chunk being parsed; written out by drain()
+        self._pending = bytearray()
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._disposition = b""
+        self._data = bytearray()
+        self._writing = None
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        if b"name" not in options:
+            raise UploadError('Form part is missing a Content-Disposition "name"')
+        self._name = options[b"name"].decode("utf-8", "replace")
+
+        if b"filename" in options:
+            if self._name != self.file_field or self.file is not None:
+                raise UploadError(f"Unexpected file part '{self._name}'")
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self.file = self.storage.create(
+                os.path.splitext(self.filename)[1], size_hint=self.size_hint
+            )
+            self._writing = self.file
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._writing is not None:
+            self._pending += data[start:end]
+            return
+        if len(self._data) + end - start > MAX_FIELD_BYTES:
+            raise UploadError(f"Form field '{self._name}' exceeds {MAX_FIELD_BYTES} bytes")
+        self._data += data[start:end]
+
+    async def drain(self):
+        """Write the file data parsed from the last chunk, off the loop if it goes to disk"""
+        if not self._pending:
+            return
+        began = time.perf_counter()
+        await self.file.write_async(bytes(self._pending))
+        self._pending.clear()
+        self.write_seconds += time.perf_counter() - began
+
+    def on_part_end(self):
+        if self._writing is None:
+            self.fields[self._name] = self._data.decode("utf-8", "replace")
+        self._writing = None
+
+
+async def receive_upload(request, storage: ScratchStorage, file_field: str = "file") -> StagedUpload:
+    """
+    Parse a multipart/form-data request, staging its file part in scratch storage
+
+    The request's Content-Length, when sent, is the size hint, so an upload
+    that fits the memory quota is placed in memory from the first byte.
+
+    Args:
+        request: Starlette request whose body has not been read yet
+        storage: Scratch storage to stage the file part in
+        file_field: Name of the form field carrying the file
+
+    Returns:
+        StagedUpload; the caller owns its file and must discard it
+
+    Raises:
+        UploadError: If the body is not multipart or has no file part
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError("Expected a multipart/form-data body")
+
+    content_length = request.headers.get("content-length")
+    receiver = _UploadReceiver(storage, file_field, int(content_length) if content_length else None)
+    parser = MultipartParser(params[b"boundary"], receiver.callbacks())
+
+    try:
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                await receiver.drain()
+            parser.finalize()
+            await receiver.drain()
+        except UploadError:
+            raise
+        except ValueError as e:
+            raise UploadError(f"Malformed multipart body: {e}")
+
+        if receiver.file is None:
+            raise UploadError(f"Missing file part '{file_field}'")
+        began = time.perf_counter()
+        await receiver.file.flush_async()
+        receiver.write_seconds += time.perf_counter() - began
+    except BaseException:
+        if receiver.file is not None:
+            receiver.file.discard()
+        raise
+
+    return StagedUpload(receiver.filename, receiver.file, receiver.fields, receiver.write_seconds)
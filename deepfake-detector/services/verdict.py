@@ -0,0 +1,17 @@
+"""
+Verdict Thresholds
+Maps a deepfake probability to the result label used by /detect, the bulk
+scanner and shadow-model agreement, so they can never disagree.
+"""
+
+DEEPFAKE_THRESHOLD = 0.7  # Confidence above this is reported as "deepfake"
+SUSPICIOUS_THRESHOLD = 0.3  # Confidence above this (up to DEEPFAKE_THRESHOLD) is "suspicious"
+
+
+def classify(confidence: float) -> str:
+    """Return "deepfake", "suspicious" or "authentic" for a deepfake probability"""
+    if confidence > DEEPFAKE_THRESHOLD:
+        return "deepfake"
+    if confidence > SUSPICIOUS_THRESHOLD:
+        return "suspicious"
+    return "authentic"
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+# Make `main`, `models` and `services` importable however pytest is invoked
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def service_env(monkeypatch, tmp_path):
+    """Environment for a fast, isolated in-process service"""
+    monkeypatch.setenv("WARMUP_ENABLED", "false")
+    monkeypatch.setenv("INFERENCE_WORKERS", "0")
+    monkeypatch.setenv("PROFILE_SAMPLE_RATE", "0")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setenv("MODEL_REGISTRY_DIR", str(tmp_path / "weights"))
+    monkeypatch.setenv("SCRATCH_MEMORY_DIR", str(tmp_path / "memory"))
+    monkeypatch.setenv("SCRATCH_DISK_DIR", str(tmp_path / "disk"))
+    monkeypatch.delenv("PHASH_INDEX_PATH", raising=False)
+    monkeypatch.delenv("MODEL_ADMIN_TOKEN", raising=False)
+    os.makedirs(tmp_path / "memory")
+    os.makedirs(tmp_path / "disk")
+    return tmp_path
+
+
+@pytest.fixture
+def client(service_env):
+    """TestClient for the detector service with startup and shutdown run"""
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
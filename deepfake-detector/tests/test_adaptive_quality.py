@@ -0,0 +1,28 @@
+import time
+
+from services.adaptive_quality import AdaptiveQualityController
+
+
+def test_untimed_request_counts_in_flight_but_not_latency():
+    controller = AdaptiveQualityController(max_in_flight=4, latency_target_ms=50.0, cooldown=0.0)
+
+    with controller.track(measure_latency=False) as tier:
+        assert tier == "full"
+        assert controller.in_flight == 1
+        time.sleep(0.12)  # A slow client upload
+        with controller.measure():
+            pass
+
+    assert controller.in_flight == 0
+    assert controller.latency_ms < 50.0
+    assert controller.tier == "full"
+
+
+def test_slow_requests_degrade_tier():
+    controller = AdaptiveQualityController(max_in_flight=8, latency_target_ms=50.0, cooldown=0.0)
+
+    with controller.track():
+        time.sleep(0.12)
+
+    assert controller.latency_ms >= 100.0
+    assert controller.tier == "minimal"
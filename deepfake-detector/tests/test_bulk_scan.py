@@ -0,0 +1,82 @@
+import json
+
+import numpy as np
+import pytest
+
+import bulk_scan
+
+
+def new_stats() -> dict:
+    return {"scanned": 0, "errors": 0, "skipped": 0}
+
+
+def test_iter_batches_skips_manifest_paths(tmp_path):
+    paths = [str(tmp_path / name) for name in ("a.png", "b.jpg", "c.png", "d.mp4", "notes.txt")]
+    done = {paths[1]}
+    stats = new_stats()
+
+    batches = list(bulk_scan.iter_batches(iter(paths), done, {"image", "video"}, 2, stats))
+
+    assert batches == [("image", [paths[0], paths[2]]), ("video", [paths[3]])]
+    assert stats["skipped"] == 1
+
+
+class FakeDetector:
+    is_loaded = True
+
+    def preprocess(self, path):
+        if path.endswith("corrupt.png"):
+            raise ValueError("cannot decode")
+        return np.full((1, 4), 0.9 if "fake" in path else 0.1, dtype=np.float32)
+
+    def infer_batch(self, inputs):
+        raise RuntimeError("batch out of memory")
+
+    def infer(self, tensor):
+        if np.isnan(tensor).any():
+            raise RuntimeError("NaN input")
+        return float(tensor[0, 0])
+
+
+@pytest.fixture
+def fake_detector(monkeypatch):
+    detector = FakeDetector()
+    monkeypatch.setitem(bulk_scan._detectors, "image", detector)
+    return detector
+
+
+def test_scan_batch_falls_back_to_single_inference(fake_detector, monkeypatch):
+    original_preprocess = fake_detector.preprocess
+
+    def preprocess(path):
+        if path.endswith("nan.png"):
+            return np.full((1, 4), np.nan, dtype=np.float32)
+        return original_preprocess(path)
+
+    monkeypatch.setattr(fake_detector, "preprocess", preprocess)
+
+    records = bulk_scan.scan_batch("image", ["/x/fake.png", "/x/corrupt.png", "/x/nan.png", "/x/real.png"])
+    by_path = {record["path"]: record for record in records}
+
+    assert by_path["/x/fake.png"]["result"] == "deepfake"
+    assert by_path["/x/real.png"]["result"] == "authentic"
+    assert by_path["/x/corrupt.png"] == {"path": "/x/corrupt.png", "type": "image", "error": "cannot decode"}
+    assert by_path["/x/nan.png"]["error"] == "NaN input"
+
+
+def test_failed_files_are_retried_on_resume(fake_detector, tmp_path):
+    output_path, manifest_path = tmp_path / "results.jsonl", tmp_path / "results.jsonl.manifest"
+    paths = [str(tmp_path / name) for name in ("fake.png", "corrupt.png")]
+    stats = new_stats()
+
+    with open(output_path, "a") as output, open(manifest_path, "a") as manifest:
+        bulk_scan.write_results(bulk_scan.scan_batch("image", paths), output, manifest, stats)
+
+    assert stats == {"scanned": 1, "errors": 1, "skipped": 0}
+    written = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert sorted("error" in record for record in written) == [False, True]
+
+    # Only the successfully scanned file is skipped by the next run
+    done = bulk_scan.load_manifest(str(manifest_path))
+    resumed = list(bulk_scan.iter_batches(iter(paths), done, {"image"}, 16, new_stats()))
+    assert resumed == [("image", [paths[1]])]
@@ -0,0 +1,154 @@
+import cv2
+import numpy as np
+
+import main
+
+CACHE_HIT = "Matched previously analysed media"
+
+
+def png_bytes(seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    image = cv2.resize(rng.integers(0, 256, (8, 8, 3), dtype=np.uint8), (128, 128))
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+def mp4_bytes(tmp_path, seconds: int = 2) -> bytes:
+    path = str(tmp_path / "clip.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (160, 120))
+    rng = np.random.default_rng(0)
+    base = cv2.resize(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8), (160, 120))
+    for i in range(30 * seconds):
+        writer.write(np.roll(base, i, axis=1))
+    writer.release()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def detect(client, payload: bytes, detection_type: str = "image", name: str = "upload.png"):
+    response = client.post(
+        "/detect", files={"file": (name, payload)}, data={"detectionType": detection_type}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def is_cache_hit(body: dict) -> bool:
+    return any(CACHE_HIT in detail for detail in body["details"])
+
+
+def test_failed_inference_is_not_cached(client):
+    # The placeholder detector has no model, so inference raises
+    first = detect(client, png_bytes())
+    assert first["confidence"] == 0.5
+    assert any("error" in detail.lower() for detail in first["details"])
+
+    second = detect(client, png_bytes())
+    assert not is_cache_hit(second)
+    assert len(main.phash_index) == 0
+
+
+def test_successful_verdict_is_reused(client, monkeypatch):
+    monkeypatch.setattr(main.image_model, "_run_inference", lambda image: 0.9)
+
+    first = detect(client, png_bytes())
+    assert first["result"] == "deepfake"
+
+    second = detect(client, png_bytes())
+    assert is_cache_hit(second)
+    assert second["confidence"] == first["confidence"]
+
+
+def test_audiovisual_never_reuses_cached_verdicts(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(main.video_model, "_run_inference_on_frame", lambda frame: 0.1)
+    clip = mp4_bytes(tmp_path)
+
+    detect(client, clip, "video", "clip.mp4")
+    assert is_cache_hit(detect(client, clip, "video", "clip.mp4"))
+
+    # Same frames, but the soundtrack could have been replaced
+    combined = detect(client, clip, "audiovisual", "clip.mp4")
+    assert not is_cache_hit(combined)
+    assert combined["modality_scores"]["video"] is not None
+
+
+def test_health_reports_warm_up_failure(service_env, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setenv("WARMUP_ENABLED", "true")
+    # The placeholder detectors have no model, so warm-up inference fails
+    with TestClient(main.app) as client:
+        assert client.get("/").json()["models_warmed_up"] is False
+
+    monkeypatch.setattr("models.image_detector.ImageDetector._run_inference", lambda self, image: 0.1)
+    monkeypatch.setattr("models.video_detector.VideoDetector._run_inference_on_frame", lambda self, frame: 0.1)
+    monkeypatch.setattr("models.audio_detector.AudioDetector.warm_up", lambda self: True)
+    with TestClient(main.app) as client:
+        assert client.get("/").json()["models_warmed_up"] is True
+
+
+def test_detect_reports_upload_staging(client):
+    response = client.post(
+        "/detect",
+        files={"file": ("upload.png", png_bytes())},
+        data={"detectionType": "image"},
+        headers={"X-Profile": "1"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["Server-Timing"].startswith("upload_write;dur=")
+
+
+def test_audiovisual_without_audio_stream_uses_frames(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(main.video_model, "_run_inference_on_frame", lambda frame: 0.1)
+    monkeypatch.setattr("models.audio_detector._has_audio_stream", lambda path: False)
+
+    body = detect(client, mp4_bytes(tmp_path), "audiovisual", "clip.mp4")
+
+    assert "No soundtrack found, verdict based on frames only" in body["details"]
+    assert body["modality_scores"]["audio"] is None
+
+
+def test_audiovisual_reports_failed_soundtrack(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(main.video_model, "_run_inference_on_frame", lambda frame: 0.1)
+    monkeypatch.setattr("models.audio_detector._has_audio_stream", lambda path: True)
+
+    def corrupt(path):
+        raise RuntimeError("invalid AAC frame")
+
+    monkeypatch.setattr(main.audio_model, "preprocess", corrupt)
+
+    body = detect(client, mp4_bytes(tmp_path), "audiovisual", "clip.mp4")
+
+    assert any("Soundtrack analysis failed (invalid AAC frame)" in d for d in body["details"])
+    assert body["modality_scores"]["audio"] is None
+
+
+def test_health_reports_worker_warm_up_failure(service_env, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setenv("WARMUP_ENABLED", "true")
+    monkeypatch.setenv("INFERENCE_WORKERS", "1")
+    # In-process warm-ups pass; the worker's own placeholder detectors still fail
+    monkeypatch.setattr("models.image_detector.ImageDetector.warm_up", lambda self: True)
+    monkeypatch.setattr("models.video_detector.VideoDetector.warm_up", lambda self: True)
+    monkeypatch.setattr("models.audio_detector.AudioDetector.warm_up", lambda self: True)
+    with TestClient(main.app) as client:
+        assert client.get("/").json()["models_warmed_up"] is False
+
+
+def test_verdict_from_replaced_model_is_not_cached(client, monkeypatch):
+    from models.image_detector import ImageDetector
+
+    monkeypatch.setattr(main.image_model, "_run_inference", lambda image: 0.9)
+    original_detect_image = main.detect_image
+
+    async def detect_then_swap(path, tier):
+        result = await original_detect_image(path, tier)
+        # A new version is published while this request is still in flight
+        main.swap_model("image", ImageDetector())
+        return result
+
+    monkeypatch.setattr(main, "detect_image", detect_then_swap)
+    assert detect(client, png_bytes())["result"] == "deepfake"
+
+    assert len(main.phash_index) == 0
@@ -0,0 +1,61 @@
+import os
+
+from load_test import find_knee, multipart_body, summarize
+
+
+def response(latency, cached=False, ok=True):
+    return {
+        "type": "image", "latency": latency, "ok": ok, "error": None if ok else "HTTP 500",
+        "tier": "full", "cached": cached, "finished": latency,
+    }
+
+
+def test_cache_hits_are_left_out_of_throughput_and_latency():
+    results = [response(2.0), response(4.0)] + [response(0.01, cached=True) for _ in range(8)]
+
+    step = summarize(rate=1.0, duration=10.0, start=0.0, results=results)
+
+    assert step["cached"] == 8
+    assert step["sent"] == 10
+    assert step["sent_rps"] == 0.2
+    assert step["throughput_rps"] == 0.2
+    assert step["p50_ms"] == 3000.0
+
+
+def test_cache_hits_do_not_hide_the_knee():
+    light = summarize(1.0, 10.0, 0.0, [response(1.0) for _ in range(10)])
+    # Fast cache hits would otherwise pull p95 back under twice the baseline
+    heavy = summarize(
+        4.0, 10.0, 0.0, [response(5.0) for _ in range(2)] + [response(0.01, cached=True) for _ in range(38)]
+    )
+
+    assert find_knee([light, heavy]) is heavy
+
+
+def test_multipart_body_streams_without_content_length(client, tmp_path, monkeypatch):
+    import main
+
+    path = tmp_path / "sample.png"
+    payload = os.urandom(200 << 10)
+    path.write_bytes(payload)
+    received = {}
+
+    async def detect_image(file_path, tier):
+        with open(file_path, "rb") as f:
+            received["payload"] = f.read()
+        return {"result": "authentic", "confidence": 0.1, "details": []}
+
+    monkeypatch.setattr(main, "detect_image", detect_image)
+    boundary = "test-boundary"
+    chunks = multipart_body(str(path), "image", boundary)
+
+    response = client.post(
+        "/detect",
+        content=chunks,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+
+    assert response.status_code == 200
+    assert "content-length" not in response.request.headers
+    assert response.request.headers["transfer-encoding"] == "chunked"
+    assert received["payload"] == payload
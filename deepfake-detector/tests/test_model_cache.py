@@ -0,0 +1,113 @@
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from services.model_cache import OnnxModel, create_onnx_session, find_onnx_model
+
+
+class FakeSession:
+    """Stands in for onnxruntime.InferenceSession and records how it was built"""
+
+    created = []
+
+    def __init__(self, path, sess_options=None, providers=None):
+        if path.endswith(".opt.onnx") and open(path, "rb").read() == b"corrupt":
+            raise RuntimeError("bad graph")
+        self.path = path
+        self.options = sess_options
+        FakeSession.created.append(self)
+        if getattr(sess_options, "optimized_model_filepath", None):
+            with open(sess_options.optimized_model_filepath, "wb") as f:
+                f.write(b"optimized")
+
+    def get_inputs(self):
+        return [types.SimpleNamespace(name="input")]
+
+    def run(self, output_names, feeds):
+        batch = feeds["input"]
+        assert batch.dtype == np.float32
+        return [np.full((len(batch), 1), 0.9, dtype=np.float32)]
+
+
+@pytest.fixture
+def fake_ort(monkeypatch):
+    ort = types.ModuleType("onnxruntime")
+    ort.__version__ = "1.0-test"
+    ort.get_available_providers = lambda: ["CPUExecutionProvider"]
+    ort.SessionOptions = types.SimpleNamespace
+    ort.GraphOptimizationLevel = types.SimpleNamespace(ORT_DISABLE_ALL=0, ORT_ENABLE_ALL=99)
+    ort.InferenceSession = FakeSession
+    monkeypatch.setitem(sys.modules, "onnxruntime", ort)
+    FakeSession.created = []
+    return ort
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    path = tmp_path / "detector.onnx"
+    path.write_bytes(b"model")
+    return str(path)
+
+
+def test_first_session_optimizes_and_later_ones_reuse_the_cache(fake_ort, model_file, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    os.makedirs(cache_dir)
+
+    first = create_onnx_session(model_file, cache_dir=cache_dir)
+    assert first.path == model_file
+    assert first.options.graph_optimization_level == 99
+    cached = first.options.optimized_model_filepath
+
+    second = create_onnx_session(model_file, cache_dir=cache_dir)
+    assert second.path == cached
+    assert second.options.graph_optimization_level == 0
+
+
+def test_unusable_cached_graph_is_rebuilt(fake_ort, model_file, tmp_path):
+    first = create_onnx_session(model_file, cache_dir=str(tmp_path))
+    with open(first.options.optimized_model_filepath, "wb") as f:
+        f.write(b"corrupt")
+
+    session = create_onnx_session(model_file, cache_dir=str(tmp_path))
+    assert session.path == model_file
+    assert open(session.options.optimized_model_filepath, "rb").read() == b"optimized"
+
+
+def test_find_onnx_model(tmp_path, model_file):
+    assert find_onnx_model(model_file) == model_file
+    assert find_onnx_model(str(tmp_path)) == model_file
+    assert find_onnx_model(str(tmp_path / "missing")) is None
+    assert find_onnx_model(None) is None
+
+    empty = tmp_path / "v2"
+    empty.mkdir()
+    (empty / "weights.pt").write_bytes(b"")
+    assert find_onnx_model(str(empty)) is None
+    assert find_onnx_model(str(empty / "weights.pt")) is None
+
+
+def test_loaders_run_onnx_models(fake_ort, model_file, tmp_path, monkeypatch):
+    from models.image_detector import load_image_model
+    from models.video_detector import load_video_model
+
+    monkeypatch.setenv("MODEL_CACHE_DIR", str(tmp_path / "cache"))
+    image = load_image_model(str(tmp_path))
+    assert isinstance(image.model, OnnxModel)
+    assert image.infer(np.zeros((1, 224, 224, 3))) == pytest.approx(0.9)
+    assert image.infer_batch([np.zeros((1, 224, 224, 3))] * 3) == pytest.approx([0.9] * 3)
+
+    video = load_video_model(model_file)
+    assert isinstance(video.model, OnnxModel)
+    assert video.infer(np.zeros((4, 224, 224, 3), dtype=np.float32)) == pytest.approx(0.9)
+
+
+def test_loaders_without_onnx_model_keep_existing_path(fake_ort, tmp_path):
+    from models.image_detector import load_image_model
+
+    detector = load_image_model(str(tmp_path))
+    assert detector.is_loaded
+    assert not isinstance(detector.model, OnnxModel)
+    assert not FakeSession.created
@@ -0,0 +1,130 @@
+import time
+
+import pytest
+
+from services.model_registry import ModelRegistry
+from services.shm_transport import InferenceWorkerPool, _WorkerModels
+
+
+def wait_for_load(registry, kind, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while registry.loading.get(kind) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class TestAdminEndpoints:
+    def test_writes_disabled_without_token(self, client):
+        assert client.get("/models").status_code == 200
+        response = client.post("/models/image/activate", json={"version": "default"})
+        assert response.status_code == 403
+        assert client.post("/models/video/shadow", json={"version": "default"}).status_code == 403
+        assert client.delete("/models/video/shadow").status_code == 403
+
+    def test_writes_need_matching_token(self, service_env, monkeypatch):
+        from fastapi.testclient import TestClient
+        import main
+
+        monkeypatch.setenv("MODEL_ADMIN_TOKEN", "s3cret")
+        with TestClient(main.app) as client:
+            assert client.get("/models").status_code == 403
+            wrong = client.post("/models/image/activate", json={"version": "default"},
+                                headers={"X-Admin-Token": "guess"})
+            assert wrong.status_code == 403
+            right = client.post("/models/image/activate", json={"version": "default"},
+                                headers={"X-Admin-Token": "s3cret"})
+            assert right.status_code == 202
+
+
+class TestSwaps:
+    def test_failed_warm_up_is_not_swapped_in(self, tmp_path):
+        swapped = []
+        # The placeholder detectors have no model, so their warm-up fails
+        registry = ModelRegistry(str(tmp_path), on_swap=lambda kind, d: swapped.append(kind))
+
+        registry.activate("image", "default")
+        wait_for_load(registry, "image")
+
+        assert swapped == []
+        assert "warm-up" in registry.errors["image"]
+
+    def test_failed_worker_load_aborts_swap(self, tmp_path):
+        def on_prepare(kind, model_path):
+            raise RuntimeError("worker could not load")
+
+        swapped = []
+        registry = ModelRegistry(str(tmp_path), on_swap=lambda kind, d: swapped.append(kind),
+                                 on_prepare=on_prepare, warm_up=False)
+        (tmp_path / "image" / "v2").mkdir(parents=True)
+
+        registry.activate("image", "v2")
+        wait_for_load(registry, "image")
+
+        assert swapped == []
+        assert registry.active["image"] == "default"
+        assert registry.errors["image"] == "worker could not load"
+
+    def test_workers_are_prepared_before_swap(self, tmp_path):
+        calls = []
+        registry = ModelRegistry(
+            str(tmp_path), on_swap=lambda kind, d: calls.append(("swap", kind)),
+            on_prepare=lambda kind, path: calls.append(("prepare", kind, path)), warm_up=False,
+        )
+        (tmp_path / "video" / "v2").mkdir(parents=True)
+
+        registry.activate("video", "v2")
+        wait_for_load(registry, "video")
+
+        assert calls == [("prepare", "video", str(tmp_path / "video" / "v2")), ("swap", "video")]
+        assert registry.active["video"] == "v2"
+
+
+class TestWorkerModels:
+    def test_keeps_serving_and_incoming_versions(self):
+        models = _WorkerModels()
+        models.add("image", None, "default")
+        models.add("image", "v2", "second")
+
+        # Requests started before the swap still find the old version
+        assert models.get("image", None) == "default"
+        assert models.get("image", "v2") == "second"
+
+    def test_drops_versions_no_longer_serving(self):
+        models = _WorkerModels()
+        models.add("image", None, "default")
+        models.add("image", "v2", "second")
+        models.get("image", "v2")
+
+        models.add("image", "v3", "third")
+
+        assert models.get("image", None) is None
+        assert models.get("image", "v2") == "second"
+        assert models.get("image", "v3") == "third"
+
+
+def start_pool(monkeypatch, warm_up: bool) -> InferenceWorkerPool:
+    # Workers read WARMUP_ENABLED when they start
+    monkeypatch.setenv("WARMUP_ENABLED", "true" if warm_up else "false")
+    pool = InferenceWorkerPool(1, slots=1, slot_bytes=1024, load_timeout=60.0)
+    pool.start()
+    return pool
+
+
+def test_worker_pool_loads_pushed_version(monkeypatch):
+    pool = start_pool(monkeypatch, warm_up=False)
+    try:
+        assert pool.warmed_up
+        pool.load_model("image", "/models/image/v2")
+    finally:
+        pool.close()
+
+
+def test_worker_pool_reports_failed_warm_up(monkeypatch):
+    # The placeholder detectors have no model, so their warm-up fails
+    pool = start_pool(monkeypatch, warm_up=True)
+    try:
+        # start() waited for every worker's own warm-up
+        assert not pool.warmed_up
+        with pytest.raises(RuntimeError, match="warm-up failed"):
+            pool.load_model("image", "/models/image/v2")
+    finally:
+        pool.close()
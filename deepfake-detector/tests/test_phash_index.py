@@ -0,0 +1,121 @@
+import random
+
+from services.phash_index import BKTree, PerceptualHashIndex, hamming_distance
+
+
+def flip(value: int, bits: int, offset: int = 0) -> int:
+    """Flip `bits` consecutive bits of a hash starting at `offset`"""
+    for bit in range(offset, offset + bits):
+        value ^= 1 << bit
+    return value
+
+
+def verdict(result="deepfake", confidence=0.9):
+    return {"result": result, "confidence": confidence, "details": []}
+
+
+class TestBKTree:
+    def test_search_matches_brute_force(self):
+        rng = random.Random(0)
+        values = [rng.getrandbits(64) for _ in range(300)]
+        # Near-duplicates so some queries have several hits within the radius
+        values += [flip(value, 3) for value in values[:50]]
+
+        tree = BKTree()
+        for entry_id, value in enumerate(values):
+            tree.add(value, entry_id)
+
+        for query in values[:20] + [rng.getrandbits(64) for _ in range(20)]:
+            for radius in (0, 4, 12):
+                expected = sorted(
+                    (hamming_distance(query, value), entry_id)
+                    for entry_id, value in enumerate(values)
+                    if hamming_distance(query, value) <= radius
+                )
+                assert sorted(tree.search(query, radius)) == expected
+
+    def test_identical_hashes_share_a_node(self):
+        tree = BKTree()
+        tree.add(0xABCD, 1)
+        tree.add(0xABCD, 2)
+
+        assert sorted(tree.search(0xABCD, 0)) == [(0, 1), (0, 2)]
+        assert tree.size == 2
+
+    def test_empty_tree(self):
+        assert BKTree().search(123, 10) == []
+
+
+class TestLookup:
+    def test_image_match_within_max_distance(self):
+        index = PerceptualHashIndex(max_distance=8)
+        index.add("image", [0xFFFF0000FFFF0000], verdict())
+
+        match = index.lookup("image", [flip(0xFFFF0000FFFF0000, 5)])
+        assert match is not None
+        assert match[0]["result"] == "deepfake"
+        assert match[1] == 5
+
+        assert index.lookup("image", [flip(0xFFFF0000FFFF0000, 9)]) is None
+
+    def test_media_types_are_separate(self):
+        index = PerceptualHashIndex()
+        index.add("image", [42], verdict())
+
+        assert index.lookup("video", [42]) is None
+
+    def test_video_needs_half_of_keyframes(self):
+        rng = random.Random(1)
+        keyframes = [rng.getrandbits(64) for _ in range(4)]
+        index = PerceptualHashIndex(max_distance=4)
+        index.add("video", keyframes, verdict())
+
+        unrelated = [rng.getrandbits(64) for _ in range(4)]
+
+        # Two of four keyframes match: majority reached
+        assert index.lookup("video", keyframes[:2] + unrelated[:2]) is not None
+        # One of four is not enough
+        assert index.lookup("video", keyframes[:1] + unrelated[:3]) is None
+        # Odd counts round up: two of three needed
+        assert index.lookup("video", keyframes[:1] + unrelated[:2]) is None
+        assert index.lookup("video", keyframes[:2] + unrelated[:1]) is not None
+
+    def test_prefers_entry_with_most_matching_keyframes(self):
+        rng = random.Random(2)
+        keyframes = [rng.getrandbits(64) for _ in range(4)]
+        index = PerceptualHashIndex(max_distance=4)
+        index.add("video", keyframes[:2] + [rng.getrandbits(64) for _ in range(2)], verdict("suspicious", 0.5))
+        index.add("video", [flip(value, 3) for value in keyframes], verdict("authentic", 0.1))
+
+        result, distance = index.lookup("video", keyframes)
+        assert result["result"] == "authentic"
+        assert distance == 3
+
+    def test_failed_verdicts_are_not_recorded(self):
+        index = PerceptualHashIndex()
+        index.add("image", [7], {**verdict("suspicious", 0.5), "error": True})
+
+        assert len(index) == 0
+        assert index.lookup("image", [7]) is None
+
+    def test_discard_by_media_type(self):
+        index = PerceptualHashIndex()
+        index.add("image", [1], verdict())
+        index.add("video", [2, 3], verdict())
+
+        index.discard(["video"])
+
+        assert len(index) == 1
+        assert index.lookup("image", [1]) is not None
+        assert index.lookup("video", [2, 3]) is None
+
+    def test_degraded_tier_verdicts_are_not_recorded(self):
+        rng = random.Random(3)
+        degraded, full = [rng.getrandbits(64) for _ in range(2)], [rng.getrandbits(64) for _ in range(2)]
+        index = PerceptualHashIndex()
+        index.add("video", degraded, {**verdict(), "analysis_tier": "minimal"})
+        index.add("video", full, {**verdict(), "analysis_tier": "full"})
+
+        assert len(index) == 1
+        assert index.lookup("video", degraded) is None
+        assert index.lookup("video", full) is not None
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+from services.profiling import Profiler, stage
+
+
+def test_full_profile_is_saved_off_the_event_loop(tmp_path, monkeypatch):
+    profiler = Profiler(directory=str(tmp_path))
+    save_threads = []
+    original_save = profiler.save
+
+    def save(profile):
+        save_threads.append(threading.current_thread())
+        original_save(profile)
+
+    monkeypatch.setattr(profiler, "save", save)
+
+    async def handle():
+        async with profiler.profile_request("image test.png", "full") as profile:
+            with stage("decode"):
+                await asyncio.sleep(0.01)
+        return profile
+
+    profile = asyncio.run(handle())
+
+    assert save_threads and save_threads[0] is not threading.main_thread()
+    assert [name for name, _ in profile.stages] == ["decode"]
+    assert sorted(p.suffix for p in tmp_path.iterdir()) == [".json", ".prof", ".txt"]
+
+
+def test_stage_timing_only_is_not_saved(tmp_path):
+    profiler = Profiler(directory=str(tmp_path))
+
+    async def handle():
+        async with profiler.profile_request("image test.png", "1") as profile:
+            with stage("decode"):
+                pass
+        return profile
+
+    profile = asyncio.run(handle())
+
+    assert "decode;dur=" in profile.server_timing()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_earlier_stages_count_toward_slow_threshold(tmp_path):
+    profiler = Profiler(slow_ms=50, directory=str(tmp_path))
+
+    async def handle():
+        async with profiler.profile_request("image test.png", stages=[("upload_write", 0.2)]) as profile:
+            pass
+        return profile
+
+    profile = asyncio.run(handle())
+
+    assert profile.stages[0] == ("upload_write", 0.2)
+    assert profile.total >= 0.2
+    assert any(p.suffix == ".json" for p in tmp_path.iterdir())
+
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+import pytest
+
+from services.progressive import (
+    ProgressSession, ScanCapacityError, ScanExecutor, SessionBusyError, SessionRegistry, sessions
+)
+
+
+async def collect(session: ProgressSession, idle_timeout: float = 0.05):
+    return [message async for message in session.subscribe(idle_timeout=idle_timeout)]
+
+
+def test_subscriber_without_upload_times_out():
+    messages = asyncio.run(collect(ProgressSession("idle")))
+
+    assert len(messages) == 1
+    assert messages[0].startswith("event: timeout\n")
+
+
+def test_subscriber_is_kept_alive_during_upload():
+    session = ProgressSession("slow")
+    session.uploading = True
+
+    async def run():
+        task = asyncio.create_task(collect(session))
+        await asyncio.sleep(0.12)
+        session.publish("result", {"result": "authentic"})
+        return await task
+
+    messages = asyncio.run(run())
+
+    assert messages[0] == ": keep-alive\n\n"
+    assert messages[-1].startswith("event: result\n")
+
+
+def test_finished_session_is_replaced_by_new_upload():
+    registry = SessionRegistry()
+    first = registry.start_upload("clip")
+    first.publish("result", {"result": "deepfake"})
+
+    second = registry.start_upload("clip")
+
+    assert second is not first
+    assert second.events == []
+    assert registry.get_or_create("clip") is second
+
+
+def test_upload_joins_waiting_subscribers():
+    registry = SessionRegistry()
+    waiting = registry.get_or_create("clip")
+
+    assert registry.start_upload("clip") is waiting
+    assert waiting.uploading
+
+
+def test_concurrent_upload_is_rejected():
+    registry = SessionRegistry()
+    registry.start_upload("clip")
+
+    with pytest.raises(SessionBusyError):
+        registry.start_upload("clip")
+
+
+def test_scan_executor_is_bounded():
+    scans = ScanExecutor(workers=1)
+    release = threading.Event()
+
+    async def run():
+        first = scans.submit(release.wait)
+        assert scans.saturated
+        with pytest.raises(ScanCapacityError):
+            scans.submit(release.wait)
+
+        release.set()
+        await first
+        assert not scans.saturated
+        return await scans.submit(lambda: "scanned")
+
+    try:
+        assert asyncio.run(run()) == "scanned"
+    finally:
+        scans.shutdown()
+
+
+def test_stream_is_refused_when_scans_are_saturated(client, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main.progressive_scans, "active", main.progressive_scans.workers)
+
+    response = client.post("/detect/stream/busy?filename=clip.mp4", content=b"\0" * 1024)
+
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    # The session was never claimed, so the client can retry under the same id
+    assert not sessions.get_or_create("busy").uploading
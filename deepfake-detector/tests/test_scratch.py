@@ -0,0 +1,165 @@
+import os
+import errno
+import asyncio
+import tempfile
+import threading
+import types
+
+import pytest
+
+from services.scratch import ScratchStorage
+
+MB = 1 << 20
+
+
+@pytest.fixture
+def storage(tmp_path):
+    memory = tmp_path / "memory"
+    memory.mkdir()
+    storage = ScratchStorage(memory_dir=str(memory), quota_bytes=4 * MB, disk_dir=str(tmp_path))
+    yield storage
+    storage.cleanup()
+
+
+def test_size_hint_reserves_quota(storage):
+    with storage.create(".mp4", size_hint=3 * MB) as staged:
+        assert staged.in_memory
+        assert staged.path.startswith(storage.memory_path)
+        assert storage.used_bytes == 3 * MB
+
+        # Only 1 MB is left, so a second large upload goes straight to disk
+        with storage.create(".mp4", size_hint=2 * MB) as other:
+            assert not other.in_memory
+            assert other.path.startswith(storage.disk_path)
+            assert storage.used_bytes == 3 * MB
+
+    assert storage.used_bytes == 0
+
+
+def test_writes_grow_reservation(storage):
+    with storage.create(".wav") as staged:
+        staged.write(b"a" * MB)
+        staged.write(b"b" * MB)
+        assert staged.in_memory
+        assert storage.used_bytes == 2 * MB
+
+    assert storage.used_bytes == 0
+
+
+def test_spill_moves_data_to_disk_and_frees_quota(storage):
+    staged = storage.create(".bin", size_hint=MB)
+    memory_path = staged.path
+    staged.write(b"x" * 3 * MB)
+    staged.write(b"y" * 2 * MB)  # 5 MB exceeds the 4 MB quota
+    staged.flush()
+
+    assert not staged.in_memory
+    assert not os.path.exists(memory_path)
+    assert staged.path.startswith(storage.disk_path)
+    assert storage.used_bytes == 0
+    with open(staged.path, "rb") as f:
+        assert f.read() == b"x" * 3 * MB + b"y" * 2 * MB
+
+    staged.discard()
+    staged.discard()
+    assert not os.path.exists(staged.path)
+
+
+def test_spilled_file_does_not_release_others_quota(storage):
+    with storage.create(".bin", size_hint=2 * MB) as held:
+        with storage.create(".bin") as spilled:
+            spilled.write(b"z" * 3 * MB)
+            assert not spilled.in_memory
+        assert storage.used_bytes == 2 * MB
+        assert held.in_memory
+
+
+
+def test_quota_is_clamped_to_free_tmpfs_space(tmp_path, monkeypatch):
+    memory = tmp_path / "memory"
+    memory.mkdir()
+    monkeypatch.setattr(os, "statvfs", lambda path: types.SimpleNamespace(f_bavail=256, f_frsize=4096))
+
+    storage = ScratchStorage(memory_dir=str(memory), quota_bytes=4 * MB, disk_dir=str(tmp_path))
+    try:
+        assert storage.quota_bytes == MB
+    finally:
+        storage.cleanup()
+
+
+def test_full_tmpfs_spills_to_disk(storage, monkeypatch):
+    staged = storage.create(".bin")
+    staged.write(b"x" * MB)
+
+    def full(fd, offset, length):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(os, "posix_fallocate", full)
+    staged.write(b"y" * MB)
+    staged.flush()
+
+    assert not staged.in_memory
+    assert storage.used_bytes == 0
+    with open(staged.path, "rb") as f:
+        assert f.read() == b"x" * MB + b"y" * MB
+    staged.discard()
+
+
+def test_async_writes_spill_off_the_event_loop(storage, monkeypatch):
+    staged = storage.create(".bin")
+    spill_threads = []
+    original_spill = staged._spill
+
+    def spill():
+        spill_threads.append(threading.current_thread())
+        original_spill()
+
+    monkeypatch.setattr(staged, "_spill", spill)
+
+    async def upload():
+        for _ in range(5):  # 5 MB exceeds the 4 MB quota
+            await staged.write_async(b"z" * MB)
+        await staged.flush_async()
+
+    asyncio.run(upload())
+
+    assert spill_threads and spill_threads[0] is not threading.main_thread()
+    assert os.path.getsize(staged.path) == 5 * MB
+    staged.discard()
+
+def test_multipart_upload_never_touches_temp_dir(client, tmp_path, monkeypatch):
+    import main
+
+    temp_dir = tmp_path / "system-tmp"
+    temp_dir.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(temp_dir))
+
+    def no_spool(*args, **kwargs):
+        raise AssertionError("upload was spooled to a temporary file")
+
+    monkeypatch.setattr(tempfile, "TemporaryFile", no_spool)
+    monkeypatch.setattr(tempfile, "SpooledTemporaryFile", no_spool)
+
+    staged = {}
+
+    async def detect_image(path, tier):
+        staged["in_memory"] = main.scratch.memory_path and path.startswith(main.scratch.memory_path)
+        staged["size"] = os.path.getsize(path)
+        staged["disk"] = os.listdir(main.scratch.disk_path)
+        return {"result": "authentic", "confidence": 0.1, "details": []}
+
+    monkeypatch.setattr(main, "detect_image", detect_image)
+    payload = os.urandom(3 * MB)
+
+    response = client.post(
+        "/detect", files={"file": ("big.png", payload)}, data={"detectionType": "image"}
+    )
+
+    assert response.status_code == 200
+    assert staged == {"in_memory": True, "size": len(payload), "disk": []}
+    assert os.listdir(temp_dir) == []
+
+
+def test_upload_without_file_part_is_rejected(client):
+    response = client.post("/detect", data={"detectionType": "image"})
+    assert response.status_code == 400
@@ -0,0 +1,103 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from services.shm_transport import SharedMemoryPool, _prune_retired
+
+
+def exists(name: str) -> bool:
+    try:
+        shared_memory.SharedMemory(name=name).close()
+        return True
+    except FileNotFoundError:
+        return False
+
+
+@pytest.fixture
+def pool():
+    pool = SharedMemoryPool(slots=2, slot_bytes=1024)
+    yield pool
+    pool.close()
+
+
+def read(descriptor):
+    segment = shared_memory.SharedMemory(name=descriptor.segment)
+    try:
+        return np.ndarray(descriptor.shape, dtype=np.dtype(descriptor.dtype), buffer=segment.buf).copy()
+    finally:
+        segment.close()
+
+
+def test_put_round_trips_tensor(pool):
+    tensor = np.arange(12, dtype=np.float32).reshape(3, 4)
+    descriptor = pool.put(tensor)
+
+    assert descriptor.pooled
+    np.testing.assert_array_equal(read(descriptor), tensor)
+    pool.release(descriptor)
+
+
+def test_released_slot_is_reused(pool):
+    first = pool.put(np.zeros(8, dtype=np.float32))
+    pool.release(first)
+
+    second = pool.put(np.ones(8, dtype=np.float32))
+    assert second.segment == first.segment
+    pool.release(second)
+
+
+def test_oversized_and_overflow_tensors_get_transient_segments(pool):
+    big = pool.put(np.zeros(1024, dtype=np.float32))  # 4 KB > 1 KB slot
+    assert not big.pooled
+
+    busy = [pool.put(np.zeros(4, dtype=np.float32)) for _ in range(2)]
+    overflow = pool.put(np.zeros(4, dtype=np.float32))
+    assert all(d.pooled for d in busy)
+    assert not overflow.pooled
+
+    for descriptor in (big, overflow):
+        pool.release(descriptor)
+        assert not exists(descriptor.segment)
+    for descriptor in busy:
+        pool.release(descriptor)
+        assert exists(descriptor.segment)
+
+
+def test_unreusable_slot_is_retired_and_replaced(pool):
+    descriptor = pool.put(np.zeros(4, dtype=np.float32))
+    pool.release(descriptor, reusable=False)
+
+    assert not exists(descriptor.segment)
+    # Capacity is unchanged and the replacement is handed out next
+    descriptors = [pool.put(np.zeros(4, dtype=np.float32)) for _ in range(2)]
+    assert all(d.pooled for d in descriptors)
+    assert descriptor.segment not in {d.segment for d in descriptors}
+
+
+def test_worker_unmaps_retired_segments(pool):
+    retired = pool.put(np.zeros(4, dtype=np.float32))
+    live = pool.put(np.zeros(4, dtype=np.float32))
+    attached = {
+        d.segment: shared_memory.SharedMemory(name=d.segment) for d in (retired, live)
+    }
+
+    pool.release(retired, reusable=False)
+    _prune_retired(attached)
+
+    assert list(attached) == [live.segment]
+    for segment in attached.values():
+        segment.close()
+    pool.release(live)
+
+
+def test_close_unlinks_everything(pool):
+    held = pool.put(np.zeros(4, dtype=np.float32))
+    transient = pool.put(np.zeros(1024, dtype=np.float32))
+
+    pool.close()
+
+    assert not exists(held.segment)
+    assert not exists(transient.segment)
+    with pytest.raises(RuntimeError):
+        pool.put(np.zeros(4, dtype=np.float32))
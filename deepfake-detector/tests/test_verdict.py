@@ -0,0 +1,23 @@
+import pytest
+
+import main
+from services.verdict import classify
+
+
+@pytest.mark.parametrize("confidence, expected", [
+    (0.0, "authentic"),
+    (0.3, "authentic"),
+    (0.31, "suspicious"),
+    (0.7, "suspicious"),
+    (0.71, "deepfake"),
+    (1.0, "deepfake"),
+])
+def test_classify_thresholds(confidence, expected):
+    assert classify(confidence) == expected
+
+
+def test_verdict_details_are_not_shared():
+    first = main.verdict("audiovisual", 0.9)
+    first["details"].append("Soundtrack score: 0.90")
+
+    assert main.verdict("audiovisual", 0.9)["details"] == ["High confidence audio-visual deepfake detection"]